@@ -10,12 +10,15 @@ import aiohttp
 from collections import Counter, deque
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING
 from pymongo.errors import ServerSelectionTimeoutError
 import aioredis
 
 import discord
 from discord.ext import commands
 from cogs.utils import context
+from cogs.utils.audit import MessageDeleteAudit
+from cogs.utils.indexes import IndexRegistry
 
 from derw import makeLogger
 
@@ -49,6 +52,7 @@ Hello human.
 initial_extensions = (
     'cogs.meta',
     'cogs.admin',
+    'cogs.timers',
     'cogs.mod',
     'cogs.reddiscord',
     'cogs.meme',
@@ -102,6 +106,15 @@ class Penelope(commands.AutoShardedBot):
         # Triggering the rate limit 5 times in a row will auto-ban the user from the bot.
         self._auto_spam_count = Counter()
 
+        # indexes declared by cogs, created once they're all loaded
+        self.indexes = IndexRegistry()
+
+        # who deleted what, shared so a deletion only costs one audit log fetch
+        self.delete_audit = MessageDeleteAudit()
+
+        # BulkWriters that have to be flushed before shutting down
+        self.bulk_writers = set()
+
     def load_initial_extensions(self):
         for extension in initial_extensions:
             try:
@@ -231,6 +244,10 @@ class Penelope(commands.AutoShardedBot):
 
     async def close(self):
         await super().close()
+
+        for writer in self.bulk_writers:
+            await writer.close()
+
         await self.session.close()
         self.mongo.close()
         self.redis.close()
@@ -245,6 +262,7 @@ class Penelope(commands.AutoShardedBot):
         await self.mongo.admin.command("ismaster")
         # Default bot database
         self.db: AsyncIOMotorDatabase = self.mongo.penelope
+        self.indexes.declare(self.db.guild_config, [('id', ASCENDING)])
         log.info(f'{self.__class__.__name__} - Connected to mongo')
 
     async def init_redis(self):
@@ -284,6 +302,7 @@ def run():
         return
 
     bot.load_initial_extensions()
+    loop.run_until_complete(bot.indexes.ensure())
     bot.run()
 
 if __name__ == "__main__":
@@ -80,5 +80,35 @@ class Admin(commands.Cog):
         new_ctx._db = ctx._db
         await self.bot.invoke(new_ctx)
 
+    @commands.group(hidden=True, invoke_without_command=True)
+    async def indexes(self, ctx):
+        """Lists the indexes declared by cogs."""
+        lines = [f'{collection.full_name}: {model.document["name"]}' for collection, model in self.bot.indexes]
+        await ctx.send('```\n' + '\n'.join(lines) + '\n```')
+
+    @indexes.command(name='profile', hidden=True)
+    async def indexes_profile(self, ctx, level: int, slowms: int = 100):
+        """Sets the database profiler level, 0 is off, 1 slow operations, 2 everything."""
+        for db in self.bot.indexes.databases:
+            await db.command('profile', level, slowms=slowms)
+
+        await ctx.message.add_reaction('\N{OK HAND SIGN}')
+
+    @indexes.command(name='scans', hidden=True)
+    async def indexes_scans(self, ctx, hours: int = 24):
+        """Reports queries the profiler saw scanning whole collections."""
+        since = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+
+        lines = []
+        for db in self.bot.indexes.databases:
+            for scan in await self.bot.indexes.collection_scans(db, since=since):
+                example = str(scan['example'])[:200]
+                lines.append(f'{scan["_id"]["ns"]} {scan["_id"]["op"]} x{scan["count"]} ({scan["docs_examined"]} docs examined)\n  {example}')
+
+        if not lines:
+            return await ctx.send(f'No collection scans in the last {hours} hours.')
+
+        await ctx.send('```\n' + '\n'.join(lines)[:1980] + '\n```')
+
 def setup(bot):
     bot.add_cog(Admin(bot))
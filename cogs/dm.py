@@ -5,6 +5,7 @@ from typing import Optional, List, Text
 import discord
 from discord.ext import commands
 
+from pymongo import ASCENDING
 from pymongo.collection import Collection
 
 GUILD = 187711261377691648
@@ -21,6 +22,9 @@ class DM(commands.Cog):
 
         self.collection: Collection = bot.db.dm
 
+        bot.indexes.declare(self.collection, [('user', ASCENDING)])
+        bot.indexes.declare(self.collection, [('channel', ASCENDING)])
+
 
     @property
     def guild(self) -> discord.Guild:
@@ -1,16 +1,49 @@
 import io
+import os
+import asyncio
 
 import difflib
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional, Text
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+from discord.ext.commands import BadArgument
 
 from .utils import cache, checks
+from .utils.archive import AttachmentArchive
+from .utils.broadcast import Broadcaster
+from .utils.bulk import BulkWriter
+from .utils.compaction import compact, expand, COMPRESSED_FIELDS
 from .utils.config import CogConfig
+from .utils.downloads import download_all
+from .utils.formats import human_size
+from .utils.logging import CogLogger
 
+from lru import LRU
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+
+# how many recently logged messages are kept in memory, more than the
+# BulkWriter can buffer so anything not written yet is always in here
+RECENT_MESSAGES = 10000
+
+# discord's upload limit for a guild without boosts
+DEFAULT_UPLOAD_LIMIT = 8 * 1024 * 1024
+
+# ATTACHMENT ARCHIVE, disabled unless a path is set
+ARCHIVE_PATH = os.environ.get("ARCHIVE_PATH")
+ARCHIVE_MAX_BYTES = int(os.environ.get("ARCHIVE_MAX_BYTES", 10 * 1024 ** 3))
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", 30))
+
+# how many attachments are archived at once
+ARCHIVE_CONCURRENCY = 4
+
+# messages older than this have their text compressed
+COMPACT_AFTER = timedelta(days=int(os.environ.get("COMPACT_AFTER_DAYS", 7)))
+
+# how many messages are compressed per round trip
+COMPACT_BATCH_SIZE = 1000
 
 class NoLogChannelException(Exception):
     pass
@@ -20,12 +53,42 @@ class LogConfig(CogConfig):
 
     enabled: bool
     broadcast_channel: discord.TextChannel
+    archive_attachments: bool = False
+    retention_days: int = 0
 
     @property
     def check(self):
         return self.enabled \
             and self.broadcast_channel is not None
 
+    async def _update_config(self, param, arg):
+        if param == 'retention_days' and arg < 0:
+            raise BadArgument('retention_days can\'t be negative, use 0 to keep messages forever')
+
+        await super()._update_config(param, arg)
+
+        if param == 'retention_days':
+            await apply_retention(self._bot.db.messages, self._guild_id, arg)
+
+    def expires(self, created_at):
+        """When a message created at `created_at` should be dropped, None to keep it."""
+        if not self.retention_days:
+            return None
+        return created_at + timedelta(days=self.retention_days)
+
+
+async def apply_retention(collection, guild_id, days):
+    """Re-dates every message logged in a guild for a new retention period.
+
+    The update is an aggregation pipeline, which needs MongoDB 4.2 or newer.
+    """
+    if days:
+        update = [{'$set': {'expire_at': {'$add': ['$created_at', days * 86400 * 1000]}}}]
+    else:
+        update = {'$unset': {'expire_at': ''}}
+
+    await collection.update_many({'guild': guild_id}, update)
+
 
 def listener_check(ctx) -> bool:
     print(ctx.author.bot)
@@ -39,6 +102,113 @@ class Log(commands.Cog):
         self.bot = bot
         self.db: AsyncIOMotorDatabase = bot.mongo.penelope
 
+        self.log = CogLogger('Penelope', self)
+
+        bot.indexes.declare(self.db.messages, [('id', ASCENDING)])
+        bot.indexes.declare(self.db.messages, [('guild', ASCENDING), ('created_at', ASCENDING)])
+        bot.indexes.declare(self.db.messages, [('compacted', ASCENDING), ('created_at', ASCENDING)])
+        bot.indexes.declare(self.db.messages, [('expire_at', ASCENDING)], expireAfterSeconds=0)
+        bot.indexes.declare(self.db.message_storage, [('guild', ASCENDING)], unique=True)
+
+        # message inserts and updates are written behind, in order
+        self.messages = BulkWriter(self.db.messages)
+        bot.bulk_writers.add(self.messages)
+
+        # message id: the document logged for it, as last written
+        self.recent = LRU(RECENT_MESSAGES)
+
+        # log embeds are queued per channel and sent several to a message
+        self.broadcaster = Broadcaster()
+
+        self.archive = None
+        if ARCHIVE_PATH:
+            self.archive = AttachmentArchive(ARCHIVE_PATH, max_bytes=ARCHIVE_MAX_BYTES, retention=ARCHIVE_RETENTION_DAYS * 86400)
+            self._archiving = asyncio.Semaphore(ARCHIVE_CONCURRENCY)
+            self.prune_archive.start()
+
+        self.compact_messages.start()
+
+    def cog_unload(self):
+        self.bot.bulk_writers.discard(self.messages)
+        self.bot.loop.create_task(self.messages.close())
+        self.bot.loop.create_task(self.broadcaster.close())
+        self.prune_archive.cancel()
+        self.compact_messages.cancel()
+
+    @tasks.loop(hours=1)
+    async def prune_archive(self):
+        removed, freed, left = await self.archive.prune()
+        if removed:
+            self.log.info(f'Pruned {removed} archived attachments ({freed} bytes), {left} bytes archived')
+
+    @tasks.loop(hours=1)
+    async def compact_messages(self):
+        """Compresses the text of messages older than `COMPACT_AFTER`, a batch at a time."""
+        query = {'compacted': None, 'created_at': {'$lt': datetime.utcnow() - COMPACT_AFTER}}
+        projection = {field: True for field in (*COMPRESSED_FIELDS, 'guild', 'edited_at')}
+
+        # guild id: [documents, raw bytes, stored bytes]
+        totals = {}
+
+        while True:
+            docs = await self.db.messages.find(query, projection).limit(COMPACT_BATCH_SIZE).to_list(None)
+            if not docs:
+                break
+
+            results = await self.bot.loop.run_in_executor(None, compact, docs)
+
+            # an edit that lands in between is left alone, the message gets compacted next time
+            result = await self.db.messages.bulk_write([
+                UpdateOne({'_id': doc['_id'], 'edited_at': doc.get('edited_at')}, update)
+                for doc, update, _, _ in results
+            ], ordered=False)
+
+            for doc, _, raw, stored in results:
+                total = totals.setdefault(doc['guild'], [0, 0, 0])
+                total[0] += 1
+                total[1] += raw
+                total[2] += stored
+
+            if len(docs) < COMPACT_BATCH_SIZE or not result.modified_count:
+                break
+
+        if not totals:
+            return
+
+        await self.db.message_storage.bulk_write([
+            UpdateOne({'guild': guild}, {'$inc': {'documents': count, 'raw_bytes': raw, 'stored_bytes': stored}}, upsert=True)
+            for guild, (count, raw, stored) in totals.items()
+        ], ordered=False)
+
+        docs = sum(t[0] for t in totals.values())
+        saved = sum(t[1] - t[2] for t in totals.values())
+        self.log.info(f'Compacted {docs} messages, saved {human_size(saved)}')
+
+    @compact_messages.before_loop
+    async def before_compact_messages(self):
+        await self.bot.wait_until_ready()
+
+    async def archive_attachments(self, message):
+        """Archives a message's attachments and records their hashes on its document."""
+        limit = message.guild.filesize_limit
+
+        async def archive(attachment):
+            async with self._archiving:
+                return await self.archive.store(self.bot.session, attachment.url, max_size=limit)
+
+        digests = await asyncio.gather(*(archive(a) for a in message.attachments))
+
+        changes = {f'attachments.{i}.sha256': digest for i, digest in enumerate(digests) if digest}
+        if not changes:
+            return
+
+        recent = self.recent.get(message.id)
+        if recent is not None:
+            attachments = [{**a, 'sha256': digest} if digest else a for a, digest in zip(recent['attachments'], digests)]
+            self.recent[message.id] = {**recent, 'attachments': attachments}
+
+        await self.messages.update({"id": message.id}, {"$set": changes})
+
     @cache.cache()
     async def get_config(self, guild_id) -> LogConfig:
         return await LogConfig.from_db(guild_id, self.bot)
@@ -52,7 +222,7 @@ class Log(commands.Cog):
         if not config.check:
             return
 
-        await self.db.messages.insert_one({
+        doc = {
             "id": message.id,
             "type": str(message.type),
             "author": message.author.id,
@@ -69,7 +239,17 @@ class Log(commands.Cog):
                 "proxy_url": attachment.proxy_url
                 } for attachment in message.attachments],
             "created_at": message.created_at
-        })
+        }
+
+        expires = config.expires(message.created_at)
+        if expires is not None:
+            doc["expire_at"] = expires
+
+        self.recent[message.id] = doc
+        await self.messages.insert(doc)
+
+        if self.archive and config.archive_attachments and message.attachments:
+            self.bot.loop.create_task(self.archive_attachments(message))
 
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
@@ -83,17 +263,24 @@ class Log(commands.Cog):
         if before.content == after.content:
             return
 
-        await self.db.messages.find_one_and_update(
+        changes = {
+            "content": after.content,
+            "clean_content": after.clean_content,
+            "mentions": after.raw_mentions,
+            "channel_mentions": after.raw_channel_mentions,
+            "role_mentions": after.raw_role_mentions,
+            "edited_at": after.edited_at
+        }
+
+        recent = self.recent.get(before.id)
+        if recent is not None:
+            # replaced rather than changed in place, the old one may still be waiting to be inserted
+            self.recent[before.id] = {**recent, **changes}
+
+        await self.messages.update(
             {"id": before.id},
             {
-                "$set": {
-                    "content": after.content,
-                    "clean_content": after.clean_content,
-                    "mentions": after.raw_mentions,
-                    "channel_mentions": after.raw_channel_mentions,
-                    "role_mentions": after.raw_role_mentions,
-                    "edited_at": after.edited_at
-                },
+                "$set": changes,
                 "$push": {
                     "edits": {
                         "content": before.content,
@@ -124,7 +311,7 @@ class Log(commands.Cog):
         e.set_author(name=f'{after.author.name}#{after.author.discriminator}', icon_url=before.author.avatar_url)
         e.set_footer(text=f'User ID: {after.author.id}')
 
-        await config.broadcast_channel.send(embed=e)
+        self.broadcaster.send(config.broadcast_channel, e)
 
     # could just use on_message_delete but I wanna catch fuckers deleting super old shit too
     @commands.Cog.listener()
@@ -136,15 +323,35 @@ class Log(commands.Cog):
         if not config.check:
             return
 
-        await self.db.messages.find_one_and_update(
-            {"id": payload.message_id},
-            {"$set": {"deleted": True}}
-        )
-
         channel: discord.abc.Messageable = self.bot.get_channel(payload.channel_id)
         message: discord.Message = None
 
-        data: dict = await self.db.messages.find_one({"id": payload.message_id})
+        # the db is only read when we don't have the logged document in memory, otherwise
+        # the delete flag is written behind like everything else. discord's cached copy
+        # isn't enough, it doesn't know which attachments were archived
+        data: dict = self.recent.get(payload.message_id)
+
+        if data is not None:
+            # lru-dict's LRU has no pop
+            del self.recent[payload.message_id]
+
+            await self.messages.update(
+                {"id": payload.message_id},
+                {"$set": {"deleted": True}}
+            )
+
+        else:
+            data = await self.db.messages.find_one_and_update(
+                {"id": payload.message_id},
+                {"$set": {"deleted": True}},
+                return_document=ReturnDocument.AFTER
+            )
+
+            # older messages have their text compressed
+            data = expand(data)
+
+        # attachment id: sha256 of the archived copy
+        archived = {a['id']: a['sha256'] for a in data['attachments'] if 'sha256' in a} if data else {}
 
         # Attempt to pull the cached message
         if payload.cached_message is not None:
@@ -172,7 +379,7 @@ class Log(commands.Cog):
             e = discord.Embed(color = 0xF44336)
             e.timestamp = datetime.now()
             e.description = f'Message `{payload.channel_id}` was deleted from <#{payload.channel_id}>, unfortunately the message was not cached'
-            await config.broadcast_channel.send(embed=e)
+            self.broadcaster.send(config.broadcast_channel, e)
             return
 
         if message.author.bot:
@@ -185,11 +392,9 @@ class Log(commands.Cog):
         e.set_footer(text=f'User ID: {message.author.id} | Message ID: {message.id}')
 
         # Attempt to correlate with audit logs
-        async for entry in self.bot.get_guild(payload.guild_id).audit_logs(action=discord.AuditLogAction.message_delete):
-            if entry.target.id == message.author.id and entry.extra.channel.id == message.channel.id:
-                e.description += f' by <@{entry.user.id}>'
-                break
-
+        deleted_by = await self.bot.delete_audit.deleted_by(self.bot.get_guild(payload.guild_id), message.author.id, message.channel.id)
+        if deleted_by:
+            e.description += f' by <@{deleted_by.id}>'
 
         if message.content:
             e.description += "\n\n"
@@ -199,22 +404,111 @@ class Log(commands.Cog):
 
         files = []
 
-        for attachment in message.attachments:
-            buffer = io.BytesIO()
+        if message.attachments:
+            # everything reuploaded has to fit in one message
+            budget = message.guild.filesize_limit if message.guild else DEFAULT_UPLOAD_LIMIT
+
+            # archived copies are read from disk, only the rest are downloaded
+            local = {}
+            if self.archive:
+                for attachment in message.attachments:
+                    if attachment.id in archived:
+                        local[attachment.id] = self.archive.open(archived[attachment.id])
+
+            remote = [a for a in message.attachments if local.get(a.id) is None]
+            downloads = dict(zip(
+                [a.id for a in remote],
+                await download_all(self.bot.session, [a.proxy_url for a in remote], max_size=budget)
+            ))
+
+            for attachment in message.attachments:
+                fp = local.get(attachment.id) or downloads.get(attachment.id)
+                size = fp.seek(0, io.SEEK_END) if fp else 0
+
+                if fp is None or size > budget:
+                    if fp:
+                        fp.close()
 
-            async with self.bot.session.get(attachment.proxy_url) as resp:
-                while True:
-                    chunk = await resp.content.read(10)
-                    if not chunk:
-                        break
-                    buffer.write(chunk)
+                    e.description += f'[Attachment {attachment.filename}]({attachment.proxy_url}) *(could not be reuploaded)*\n'
+                    continue
 
-            buffer.seek(0)
-            files.append(discord.File(buffer, filename=attachment.filename))
+                budget -= size
+                fp.seek(0)
+                files.append(discord.File(fp, filename=attachment.filename))
 
-            e.description += f'[Attachment {attachment.filename}]({attachment.proxy_url})\n'
+                e.description += f'[Attachment {attachment.filename}]({attachment.proxy_url})\n'
 
-        await config.broadcast_channel.send(embed=e, files=files)
+        self.broadcaster.send(config.broadcast_channel, e, files=files)
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent):
+        if not payload.guild_id:
+            return
+
+        config = await self.get_config(payload.guild_id)
+        if not config.check:
+            return
+
+        ids = list(payload.message_ids)
+
+        # message id: logged document, from memory where we still have it
+        docs = {}
+        for message_id in ids:
+            doc = self.recent.get(message_id)
+            if doc is not None:
+                del self.recent[message_id]
+                docs[message_id] = doc
+
+        # land any inserts still waiting, so one update covers every message
+        await self.messages.flush()
+
+        missing = [i for i in ids if i not in docs]
+        update = self.db.messages.update_many({"id": {"$in": ids}}, {"$set": {"deleted": True}})
+        if missing:
+            found, _ = await asyncio.gather(self.db.messages.find({"id": {"$in": missing}}).to_list(None), update)
+            docs.update((doc['id'], expand(doc)) for doc in found)
+        else:
+            await update
+
+        guild = self.bot.get_guild(payload.guild_id)
+        cached = {m.id: m for m in payload.cached_messages}
+
+        lines = []
+        for message_id in sorted(set(docs) | set(cached)):
+            message = cached.get(message_id)
+            if message is not None:
+                if message.author.bot:
+                    continue
+                author, content, attachments = message.author, message.content, [(a.filename, a.proxy_url) for a in message.attachments]
+                created_at = message.created_at
+
+            else:
+                doc = docs[message_id]
+                author = guild.get_member(doc['author']) or self.bot.get_user(doc['author']) or doc['author']
+                content, attachments = doc['content'], [(a['filename'], a['proxy_url']) for a in doc['attachments']]
+                created_at = doc['created_at']
+
+            name = f'{author} ({author.id})' if isinstance(author, discord.abc.User) else f'Unknown user ({author})'
+            lines.append(f'[{created_at:%Y-%m-%d %H:%M:%S}] {name}: {content}')
+            lines.extend(f'    Attachment {filename}: {url}' for filename, url in attachments)
+
+        logged = len(docs.keys() | cached.keys())
+
+        e = discord.Embed(color = 0xF44336)
+        e.description = f'**{len(ids)} messages bulk deleted in** <#{payload.channel_id}>'
+        if logged < len(ids):
+            e.description += f'\n\n{len(ids) - logged} of them were not logged'
+        e.timestamp = datetime.now()
+        e.set_footer(text=f'Channel ID: {payload.channel_id}')
+
+        files = []
+        if lines:
+            channel = self.bot.get_channel(payload.channel_id)
+            header = f'{len(ids)} messages deleted from #{channel} ({payload.channel_id}) at {datetime.utcnow():%Y-%m-%d %H:%M:%S} UTC\n\n'
+            transcript = io.BytesIO((header + '\n'.join(lines)).encode())
+            files.append(discord.File(transcript, filename=f'deleted-{payload.channel_id}.txt'))
+
+        self.broadcaster.send(config.broadcast_channel, e, files=files)
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
@@ -228,7 +522,7 @@ class Log(commands.Cog):
         e.set_author(name=f'{member.name}#{member.discriminator}', icon_url=member.avatar_url)
         e.set_footer(text=f'ID: {member.id}')
 
-        await config.broadcast_channel.send(embed=e)
+        self.broadcaster.send(config.broadcast_channel, e)
 
     @commands.Cog.listener()
     async def on_member_remove(self, member: discord.Member):
@@ -242,7 +536,7 @@ class Log(commands.Cog):
         e.set_author(name=f'{member.name}#{member.discriminator}', icon_url=member.avatar_url)
         e.set_footer(text=f'ID: {member.id}')
 
-        await config.broadcast_channel.send(embed=e)
+        self.broadcaster.send(config.broadcast_channel, e)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
@@ -262,7 +556,7 @@ class Log(commands.Cog):
         e.set_footer(text=f'ID: {after.id}')
         e.timestamp = datetime.now()
 
-        await config.broadcast_channel.send(embed=e)
+        self.broadcaster.send(config.broadcast_channel, e)
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
@@ -280,7 +574,7 @@ class Log(commands.Cog):
         e.description = f'<@{user.id}> **added reaction {payload.emoji} to** [a message](https://discordapp.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}) in <#{payload.channel_id}>'
         e.timestamp = datetime.now()
 
-        await config.broadcast_channel.send(embed=e)
+        self.broadcaster.send(config.broadcast_channel, e)
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
@@ -298,7 +592,7 @@ class Log(commands.Cog):
         e.description = f'<@{user.id}> **removed reaction {payload.emoji} from** [a message](https://discordapp.com/channels/{payload.guild_id}/{payload.channel_id}/{payload.message_id}) in <#{payload.channel_id}>'
         e.timestamp = datetime.now()
 
-        await config.broadcast_channel.send(embed=e)
+        self.broadcaster.send(config.broadcast_channel, e)
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
@@ -326,7 +620,12 @@ class Log(commands.Cog):
 
         e.set_footer(text=f'ID: {member.id}')
 
-        await config.broadcast_channel.send(embed=e)
+        self.broadcaster.send(config.broadcast_channel, e)
+
+    @commands.Cog.listener()
+    async def on_webhooks_update(self, channel: discord.abc.GuildChannel):
+        # ours may have been deleted, look it up again on the next send
+        self.broadcaster.forget(channel.id)
 
     ##########################################################################################
 
@@ -342,6 +641,55 @@ class Log(commands.Cog):
         config = await self.get_config(ctx.guild.id)
         await config.handle_command(ctx, param, arg)
 
+    @log.command()
+    async def storage(self, ctx):
+        """Shows how much space logged messages take up"""
+        config = await self.get_config(ctx.guild.id)
+
+        stats = await self.db.command('collStats', 'messages')
+        logged = await self.db.messages.count_documents({'guild': ctx.guild.id})
+        compacted = await self.db.message_storage.find_one({'guild': ctx.guild.id}) or {}
+
+        e = discord.Embed(color=0xD81B60)
+        e.title = 'Message log storage'
+
+        kept = f'for {config.retention_days} days' if config.retention_days else 'forever'
+        e.add_field(name='This server', value=f'{logged} messages logged, kept {kept}', inline=False)
+
+        if compacted:
+            raw, stored = compacted['raw_bytes'], compacted['stored_bytes']
+            saved = (raw - stored) / raw if raw else 0
+            e.add_field(
+                name='Compressed',
+                value=f'{compacted["documents"]} messages, {human_size(raw)} down to {human_size(stored)} ({saved:.0%} saved)',
+                inline=False
+            )
+
+        e.add_field(
+            name='All servers',
+            value=f'{stats["count"]} messages, {human_size(stats["size"])} of data, '
+                f'{human_size(stats["storageSize"])} on disk, {human_size(stats["totalIndexSize"])} of indexes',
+            inline=False
+        )
+
+        await ctx.send(embed=e)
+
+    @log.command(aliases=['q'])
+    async def queue(self, ctx):
+        """Shows how many log embeds are waiting to be sent"""
+        config = await self.get_config(ctx.guild.id)
+        if config.broadcast_channel is None:
+            return await ctx.send('No log channel is set')
+
+        pending, embeds, messages = self.broadcaster.stats(config.broadcast_channel.id)
+        per_message = embeds / messages if messages else 0
+
+        await ctx.send(
+            f'{pending} embeds waiting for {config.broadcast_channel.mention}, '
+            f'{embeds} sent in {messages} messages ({per_message:.1f} per message). '
+            f'{len(self.broadcaster)} waiting across all log channels'
+        )
+
 
 def setup(bot):
     bot.add_cog(Log(bot))
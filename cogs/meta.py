@@ -466,7 +466,13 @@ class Meta(commands.Cog):
         """Shows info about the current server."""
 
         guild = ctx.guild
-        roles = [role.name.replace('@', '@\u200b') for role in guild.roles]
+
+        mod = self.bot.get_cog('Mod')
+        if mod is not None:
+            counts = await mod.get_role_counts(guild)
+            roles = [f'{role.name} ({counts[role.id]})'.replace('@', '@\u200b') for role in guild.roles]
+        else:
+            roles = [role.name.replace('@', '@\u200b') for role in guild.roles]
 
         # we're going to duck type our way here
         class Secret:
@@ -1,6 +1,6 @@
 from discord.ext import commands
 from .utils import checks, time, cache, formats
-from collections import Counter, defaultdict
+from collections import defaultdict
 from inspect import cleandoc
 from typing import List
 
@@ -16,11 +16,31 @@ import typing
 
 import unidecode
 
+from pymongo import ASCENDING
+
+from .utils.bans import BanCache
 from .utils.config import CogConfig
 from .utils.logging import CogLogger
+from .utils.filters import MessageFilter
+from .utils.purge import Purge
+from .utils.roles import RoleCounts
+from .utils.spam import MentionTracker
 
 RE_NONASCII = re.compile(r"^[^a-zA-Z0-9]*$")
 RE_IMAGE = re.compile(r"/([^/]+\.(?:jpg|gif|png))")
+RE_CUSTOM_EMOJI = re.compile(r'<:(\w+):(\d+)>')
+
+# strict raid mode kicks accounts created at most this long before joining,
+# for this long after they join
+RAID_SUSPICIOUS_WINDOW = datetime.timedelta(minutes=30)
+RAID_KICK_MEMORY = datetime.timedelta(days=1)
+
+# most messages a single purge will search through
+PURGE_SEARCH_MAX = 50000
+
+# how many member edits the bulk name normalization keeps in flight
+NORMALIZE_CONCURRENCY = 5
+NORMALIZE_CHUNK_SIZE = 50
 
 ## Misc utilities
 
@@ -44,6 +64,7 @@ class ModConfig(CogConfig):
     raid_mode: int = 0
     broadcast_channel: discord.TextChannel
     mention_count: int = 0
+    mention_window: int = 60
     safe_mention_channels: List[discord.TextChannel]
     image_only_channels: List[discord.TextChannel]
     normalize_names: bool = False
@@ -52,6 +73,16 @@ class ModConfig(CogConfig):
     def check(self):
         return True
 
+    async def _update_config(self, param, arg):
+        if param == 'mention_window' and arg <= 0:
+            raise commands.BadArgument('mention_window must be at least 1 second')
+
+        await super()._update_config(param, arg)
+
+@cache.cache(maxsize=4096)
+def transliterate(name):
+    return unidecode.unidecode(name)
+
 ## Converters
 
 def can_execute_action(ctx, user, target):
@@ -75,12 +106,12 @@ class MemberID(commands.Converter):
 
 class BannedMember(commands.Converter):
     async def convert(self, ctx, argument):
-        ban_list = await ctx.guild.bans()
+        bans = ctx.cog.bans
         try:
             member_id = int(argument, base=10)
-            entity = discord.utils.find(lambda u: u.user.id == member_id, ban_list)
+            entity = await bans.get(ctx.guild, member_id)
         except ValueError:
-            entity = discord.utils.find(lambda u: str(u.user) == argument, ban_list)
+            entity = await bans.get_named(ctx.guild, argument)
 
         if entity is None:
             raise commands.BadArgument("Not a valid previously-banned member.")
@@ -106,8 +137,30 @@ class Mod(commands.Cog):
 
         self.log = CogLogger('Penelope', self)
 
-        # guild_id: set(user_id)
-        self._recently_kicked = defaultdict(set)
+        bot.indexes.declare(self.db.guild_mod_config, [('id', ASCENDING)])
+        bot.indexes.declare(self.db.normalize_jobs, [('id', ASCENDING)])
+
+        # guild_id: ExpiringMap(user_id: suspicious until)
+        self._suspicious = defaultdict(lambda: cache.ExpiringMap(clock=datetime.datetime.utcnow))
+
+        # guild_id: since when every strict mode join is in `_suspicious`, defaults to when the cog loaded
+        self._loaded_at = datetime.datetime.utcnow()
+        self._seeded_at = {}
+
+        # guild_id: ExpiringMap(user_id: forget kick at)
+        self._recently_kicked = defaultdict(lambda: cache.ExpiringMap(RAID_KICK_MEMORY, clock=datetime.datetime.utcnow))
+
+        # channel_id: Purge
+        self._purges = {}
+
+        # distinct users mentioned per member over the last mention_window seconds
+        self._mentions = MentionTracker()
+
+        # guild_ids with a bulk name normalization running
+        self._normalizing = set()
+
+        self.role_counts = RoleCounts()
+        self.bans = BanCache()
 
     def __repr__(self):
         return '<cogs.Mod>'
@@ -134,20 +187,33 @@ class Mod(commands.Cog):
         config = await self.get_config(ctx.guild.id)
         await config.handle_command(ctx, *args)
 
-    async def check_raid(self, config, guild, member, timestamp):
-        if config.raid_mode != RaidMode.strict.value:
-            return
+    def suspicious_until(self, member):
+        # they must have created their account at most 30 minutes before they joined.
+        if member.joined_at is None or member.joined_at - member.created_at > RAID_SUSPICIOUS_WINDOW:
+            return None
 
-        delta  = (member.joined_at - member.created_at).total_seconds() // 60
+        return member.joined_at + RAID_SUSPICIOUS_WINDOW
 
-        # they must have created their account at most 30 minutes before they joined.
-        if delta > 30:
+    def mark_suspicious(self, member):
+        deadline = self.suspicious_until(member)
+        if deadline is not None:
+            self._suspicious[member.guild.id].set(member.id, deadline)
+
+    async def check_raid(self, config, guild, member, timestamp):
+        if config.raid_mode != RaidMode.strict.value:
             return
 
-        delta = (timestamp - member.joined_at).total_seconds() // 60
+        suspicious = self._suspicious[guild.id]
 
         # check if this is their first action in the 30 minutes they joined
-        if delta > 30:
+        deadline = suspicious.get(member.id)
+        if deadline is None and member.joined_at is not None:
+            # only joins from before the map was complete can be missing from it, work those out from the member
+            seeded_at = self._seeded_at.get(guild.id, self._loaded_at)
+            if timestamp - RAID_SUSPICIOUS_WINDOW <= member.joined_at < seeded_at:
+                deadline = self.suspicious_until(member)
+
+        if deadline is None or timestamp > deadline:
             return
 
         try:
@@ -172,7 +238,8 @@ class Mod(commands.Cog):
             self.log.info(f'[Raid Mode] Failed to kick {member} (ID: {member.id}) from server {member.guild} via strict mode.')
         else:
             self.log.info(f'[Raid Mode] Kicked {member} (ID: {member.id}) from server {member.guild} via strict mode.')
-            self._recently_kicked[guild.id].add(member.id)
+            suspicious.pop(member.id)
+            self._recently_kicked[guild.id].set(member.id)
 
     async def handle_image_only(self, message: discord.Message):
         config = await self.get_config(message.guild.id)
@@ -216,22 +283,28 @@ class Mod(commands.Cog):
         await self.check_raid(config, message.guild, author, message.created_at)
 
         # auto-ban tracking for mention spams begin here
-        if len(message.mentions) <= 3:
+        if not message.mentions:
             return
 
         if not config.mention_count:
             return
 
-        # check if it meets the thresholds required
-        mention_count = sum(not m.bot and m.id != author.id for m in message.mentions)
-        if mention_count < config.mention_count:
+        mentioned = [m.id for m in message.mentions if not m.bot and m.id != author.id]
+        if not mentioned:
+            return
+
+        if message.channel in config.safe_mention_channels:
             return
 
-        if message.channel.id in config.safe_mention_channel_ids:
+        # check if it meets the thresholds required, counting mentions spread over several messages
+        mention_count = self._mentions.add(guild_id, author.id, mentioned, window=config.mention_window, limit=config.mention_count)
+        if mention_count < config.mention_count:
             return
 
+        self._mentions.clear(guild_id, author.id)
+
         try:
-            await author.ban(reason=f'Spamming mentions ({mention_count} mentions)')
+            await author.ban(reason=f'Spamming mentions ({mention_count} mentions in {config.mention_window} seconds)')
         except Exception as e:
             self.log.info(f'Failed to autoban member {author} (ID: {author.id}) in guild ID {guild_id}')
         else:
@@ -253,24 +326,154 @@ class Mod(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.role_counts.member_update(before, after)
+
         if before.nick != after.nick:
             await self.normalize_name(after)
 
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.role_counts.member_remove(member)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        self.role_counts.role_delete(role)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        self.role_counts.clear(guild.id)
+        self.bans.clear(guild.id)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # ban and member events missed while disconnected would leave these wrong,
+        # a resume replays them so they're still good after one
+        self.bans.clear()
+        self.role_counts.clear()
+
+    @commands.Cog.listener()
+    async def on_member_ban(self, guild, user):
+        self.bans.banned(guild, user)
+
+    @commands.Cog.listener()
+    async def on_member_unban(self, guild, user):
+        self.bans.unbanned(guild, user)
+
+    async def get_role_counts(self, guild):
+        # counts are seeded from the member list, so it has to be complete first
+        if not guild.chunked:
+            await self.bot.request_offline_members(guild)
+
+        return self.role_counts.get(guild)
+
+    def normalized_name(self, member: discord.Member):
+        """The nickname the member should be given, or None if theirs is fine."""
+
+        # ignore "moderators"
+        if member.guild_permissions.manage_guild:
+            return None
+
+        name = member.nick or member.display_name
+        if not RE_NONASCII.findall(name):
+            return None
+
+        normalized = transliterate(name)
+        if normalized == member.nick:
+            return None
+
+        return normalized
+
     async def normalize_name(self, member: discord.Member):
         config = await self.get_config(member.guild.id)
         if not config.normalize_names:
             return
 
-        # ignore "moderators"
-        if member.guild_permissions.manage_guild:
-            return
+        nick = self.normalized_name(member)
+        if nick is not None:
+            await member.edit(nick=nick)
 
-        name = member.nick or member.display_name
-        if RE_NONASCII.findall(name):
-            await member.edit(nick=unidecode.unidecode(name))
+    @commands.command(name='normalizenames')
+    @commands.guild_only()
+    @checks.is_mod()
+    async def normalize_names(self, ctx, restart: bool = False):
+        """Normalizes the names of every existing member of the server.
+
+        This does the same thing the `normalize_names` config does for new
+        members and nickname changes. The progress is saved as it goes, so
+        if the bot restarts, running this again picks up where it stopped.
+        Pass `yes` to start over from the beginning instead.
+        """
+
+        guild = ctx.guild
+        if guild.id in self._normalizing:
+            return await ctx.send('Names are already being normalized on this server.')
+
+        if not ctx.me.guild_permissions.manage_nicknames:
+            return await ctx.send('\N{NO ENTRY SIGN} I do not have permissions to manage nicknames.')
+
+        self._normalizing.add(guild.id)
+        try:
+            await self._normalize_names(ctx, restart)
+        finally:
+            self._normalizing.discard(guild.id)
+
+    async def _normalize_names(self, ctx, restart):
+        guild = ctx.guild
+
+        if not guild.chunked:
+            await self.bot.request_offline_members(guild)
+
+        cursor = 0
+        if not restart:
+            doc = await self.db.normalize_jobs.find_one({"id": guild.id})
+            cursor = doc["cursor"] if doc else 0
+
+        # members in ID order, so the last ID done is enough to resume from
+        todo = []
+        for member in sorted(guild.members, key=lambda m: m.id):
+            if member.id <= cursor:
+                continue
+
+            nick = self.normalized_name(member)
+            if nick is not None:
+                todo.append((member, nick))
+
+        if not todo:
+            await self.db.normalize_jobs.delete_one({"id": guild.id})
+            return await ctx.send('All member names are already normalized.')
+
+        status = await ctx.send(f'Normalizing {len(todo)} names...')
+        semaphore = asyncio.Semaphore(NORMALIZE_CONCURRENCY)
+        failed = 0
+
+        async def edit(member, nick):
+            nonlocal failed
+            async with semaphore:
+                try:
+                    await member.edit(nick=nick, reason=f'Name normalization by {ctx.author} (ID: {ctx.author.id})')
+                except discord.HTTPException:
+                    failed += 1
+
+        for i in range(0, len(todo), NORMALIZE_CHUNK_SIZE):
+            chunk = todo[i:i + NORMALIZE_CHUNK_SIZE]
+            await asyncio.gather(*(edit(member, nick) for member, nick in chunk))
+
+            await self.db.normalize_jobs.update_one(
+                {"id": guild.id},
+                {"$set": {"cursor": chunk[-1][0].id}},
+                upsert = True
+            )
+
+            done = i + len(chunk)
+            await status.edit(content=f'Normalizing names... {done}/{len(todo)} ({failed} failed)')
+
+        await self.db.normalize_jobs.delete_one({"id": guild.id})
+        await status.edit(content=f'Normalized {len(todo) - failed}/{len(todo)} names ({failed} failed).')
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
+        self.role_counts.member_join(member)
+
         await self.normalize_name(member)
 
         config = await self.get_config(member.guild.id)
@@ -284,14 +487,11 @@ class Mod(commands.Cog):
         was_kicked = False
 
         if config.raid_mode == RaidMode.strict.value:
-            was_kicked = self._recently_kicked.get(member.guild.id)
-            if was_kicked is not None:
-                try:
-                    was_kicked.remove(member.id)
-                except KeyError:
-                    was_kicked = False
-                else:
-                    was_kicked = True
+            self.mark_suspicious(member)
+
+            recently_kicked = self._recently_kicked.get(member.guild.id)
+            if recently_kicked is not None:
+                was_kicked = recently_kicked.pop(member.id) is not None
 
         # Do the broadcasted message to the channel
         if was_kicked:
@@ -411,7 +611,11 @@ class Mod(commands.Cog):
             upsert = True
         )
 
+        self._suspicious.pop(ctx.guild.id, None)
         self._recently_kicked.pop(ctx.guild.id, None)
+
+        # joins stop being tracked, until strict mode is turned on again nothing in the map can be trusted
+        self._seeded_at[ctx.guild.id] = datetime.datetime.max
         self.get_config.invalidate(self, ctx.guild.id)
         await ctx.send('Raid mode disabled. No longer broadcasting join messages.')
 
@@ -449,25 +653,55 @@ class Mod(commands.Cog):
             upsert = True
         )
 
+        # pick up anyone who joined shortly before strict mode was turned on
+        now = datetime.datetime.utcnow()
+        cutoff = now - RAID_SUSPICIOUS_WINDOW
+        for member in ctx.guild.members:
+            if member.joined_at and member.joined_at > cutoff:
+                self.mark_suspicious(member)
+
+        self._seeded_at[ctx.guild.id] = now
+
         self.get_config.invalidate(self, ctx.guild.id)
         await ctx.send(f'Raid mode enabled strictly. Broadcasting join messages to {channel.mention}.')
 
+    async def run_purge(self, ctx, limit, predicate, *, before=None, after=None, bulk=True):
+        status = None
+
+        async def progress(purge):
+            nonlocal status
+            fmt = f'Searched {purge.searched}/{purge.limit} messages, {purge.deleted} removed so far...'
+            if status is None:
+                status = await ctx.send(fmt)
+            else:
+                await status.edit(content=fmt)
+
+        purge = Purge(ctx.channel, limit=limit, check=predicate, before=before, after=after, bulk=bulk, progress=progress)
+        self._purges[ctx.channel.id] = purge
+        try:
+            return await purge.run()
+        finally:
+            del self._purges[ctx.channel.id]
+            if status is not None:
+                # someone may have deleted it already, that shouldn't hide the result
+                try:
+                    await status.delete()
+                except discord.HTTPException:
+                    pass
+
     async def _basic_cleanup_strategy(self, ctx, search):
-        count = 0
-        async for msg in ctx.history(limit=search, before=ctx.message):
-            if msg.author == ctx.me:
-                await msg.delete()
-                count += 1
-        return { 'Bot': count }
+        # without Manage Messages we can only delete our own messages, one at a time
+        purge = await self.run_purge(ctx, search, lambda m: m.author == ctx.me, before=ctx.message, bulk=False)
+        return { 'Bot': purge.deleted }
 
     async def _complex_cleanup_strategy(self, ctx, search):
-        prefixes = tuple(self.bot.get_guild_prefixes(ctx.guild)) # thanks startswith
+        prefixes = tuple(await self.bot.get_guild_prefixes(ctx.guild)) # thanks startswith
 
         def check(m):
             return m.author == ctx.me or m.content.startswith(prefixes)
 
-        deleted = await ctx.channel.purge(limit=search, check=check, before=ctx.message)
-        return Counter(m.author.display_name for m in deleted)
+        purge = await self.run_purge(ctx, search, check, before=ctx.message)
+        return purge.spammers
 
     @commands.command()
     @checks.has_permissions(manage_messages=True)
@@ -485,6 +719,9 @@ class Mod(commands.Cog):
         You must have Manage Messages permission to use this.
         """
 
+        if ctx.channel.id in self._purges:
+            return await ctx.send('A purge is already running in this channel, use `remove cancel` to stop it.')
+
         strategy = self._basic_cleanup_strategy
         if ctx.me.permissions_in(ctx.channel).manage_messages:
             strategy = self._complex_cleanup_strategy
@@ -605,27 +842,28 @@ class Mod(commands.Cog):
             channel = await commands.TextChannelConverter().convert(ctx, args.channel)
             before = args.before and discord.Object(id=args.before)
             after = args.after and discord.Object(id=args.after)
-            predicates = []
+            filters = MessageFilter()
+            if args.embeds:
+                filters.add(args.embeds)
+            if args.files:
+                filters.add(args.files)
             if args.contains:
-                predicates.append(lambda m: args.contains in m.content)
+                filters.contains([args.contains])
             if args.starts:
-                predicates.append(lambda m: m.content.startswith(args.starts))
+                filters.starts([args.starts])
             if args.ends:
-                predicates.append(lambda m: m.content.endswith(args.ends))
+                filters.ends([args.ends])
             if args.match:
                 try:
                     _match = re.compile(args.match)
                 except re.error as e:
                     return await ctx.send(f'Invalid regex passed to `--match`: {e}')
                 else:
-                    predicates.append(lambda m, x=_match: x.match(m.content))
-            if args.embeds:
-                predicates.append(args.embeds)
-            if args.files:
-                predicates.append(args.files)
+                    filters.match(_match)
 
+            predicate = filters.compile()
             async for message in channel.history(limit=min(max(1, args.search), 2000), before=before, after=after):
-                if all(p(message) for p in predicates):
+                if predicate(message):
                     members.append(message.author)
         else:
             members = ctx.guild.members
@@ -744,6 +982,8 @@ class Mod(commands.Cog):
             reason = f'Action done by {ctx.author} (ID: {ctx.author.id})'
 
         await ctx.guild.unban(member.user, reason=reason)
+        self.bans.unbanned(ctx.guild, member.user)
+
         if member.reason:
             await ctx.send(f'Unbanned {member.user} (ID: {member.user.id}), previously banned for {member.reason}.')
         else:
@@ -772,12 +1012,12 @@ class Mod(commands.Cog):
         if reason is None:
             reason = f'Action done by {ctx.author} (ID: {ctx.author.id})'
 
-        reminder = self.bot.get_cog('Reminder')
-        if reminder is None:
+        timers = self.bot.get_cog('Timers')
+        if timers is None:
             return await ctx.send('Sorry, this functionality is currently unavailable. Try again later?')
 
         await ctx.guild.ban(discord.Object(id=member), reason=reason)
-        timer = await reminder.create_timer(duration.dt, 'tempban', ctx.guild.id, ctx.author.id, member, connection=ctx.db)
+        timer = await timers.create_timer(duration.dt, 'tempban', ctx.guild.id, ctx.author.id, member)
         await ctx.send(f'Banned ID {member} for {time.human_timedelta(duration.dt)}.')
 
     @commands.Cog.listener()
@@ -810,8 +1050,10 @@ class Mod(commands.Cog):
     async def mentionspam(self, ctx, count: int=None):
         """Enables auto-banning accounts that spam mentions.
 
-        If a message contains `count` or more mentions then the
-        bot will automatically attempt to auto-ban the member.
+        If a member mentions `count` or more different users within
+        the `mention_window` config (60 seconds by default), even
+        across several messages, then the bot will automatically
+        attempt to auto-ban the member.
         The `count` must be greater than 3. If the `count` is 0
         then this is disabled.
 
@@ -911,14 +1153,20 @@ class Mod(commands.Cog):
 
         When the command is done doing its work, you will get a message
         detailing which users got removed and how many messages got removed.
+
+        Large searches report their progress as they go and can be stopped
+        early with the `cancel` subcommand.
         """
 
         if ctx.invoked_subcommand is None:
             await ctx.send_help(ctx.command)
 
     async def do_removal(self, ctx, limit, predicate, *, before=None, after=None):
-        if limit > 2000:
-            return await ctx.send(f'Too many messages to search given ({limit}/2000)')
+        if limit > PURGE_SEARCH_MAX:
+            return await ctx.send(f'Too many messages to search given ({limit}/{PURGE_SEARCH_MAX})')
+
+        if ctx.channel.id in self._purges:
+            return await ctx.send('A purge is already running in this channel, use `remove cancel` to stop it.')
 
         if before is None:
             before = ctx.message
@@ -929,15 +1177,17 @@ class Mod(commands.Cog):
             after = discord.Object(id=after)
 
         try:
-            deleted = await ctx.channel.purge(limit=limit, before=before, after=after, check=predicate)
+            purge = await self.run_purge(ctx, limit, predicate, before=before, after=after)
         except discord.Forbidden as e:
             return await ctx.send('I do not have permissions to delete messages.')
         except discord.HTTPException as e:
             return await ctx.send(f'Error: {e} (try a smaller search?)')
 
-        spammers = Counter(m.author.display_name for m in deleted)
-        deleted = len(deleted)
+        spammers = purge.spammers
+        deleted = purge.deleted
         messages = [f'{deleted} message{" was" if deleted == 1 else "s were"} removed.']
+        if purge.cancelled:
+            messages[0] += f' Cancelled after searching {purge.searched} messages.'
         if deleted:
             messages.append('')
             spammers = sorted(spammers.items(), key=lambda t: t[1], reverse=True)
@@ -950,6 +1200,16 @@ class Mod(commands.Cog):
         else:
             await ctx.send(to_send, delete_after=10)
 
+    @remove.command(name='cancel', aliases=['stop'])
+    async def _cancel(self, ctx):
+        """Stops the purge running in this channel."""
+        purge = self._purges.get(ctx.channel.id)
+        if purge is None:
+            return await ctx.send('No purge is running in this channel.')
+
+        purge.cancel()
+        await ctx.message.add_reaction('\N{OK HAND SIGN}')
+
     @remove.command()
     async def embeds(self, ctx, search=100):
         """Removes messages that have embeds in them."""
@@ -998,9 +1258,8 @@ class Mod(commands.Cog):
     @remove.command(name='emoji')
     async def _emoji(self, ctx, search=100):
         """Removes all messages containing custom emoji."""
-        custom_emoji = re.compile(r'<:(\w+):(\d+)>')
         def predicate(m):
-            return custom_emoji.search(m.content)
+            return RE_CUSTOM_EMOJI.search(m.content)
 
         await self.do_removal(ctx, search, predicate)
 
@@ -1036,7 +1295,7 @@ class Mod(commands.Cog):
         `--contains`: A substring to search for in the message.
         `--starts`: A substring to search if the message starts with.
         `--ends`: A substring to search if the message ends with.
-        `--search`: How many messages to search. Default 100. Max 2000.
+        `--search`: How many messages to search. Default 100. Max 50000.
         `--after`: Messages must come after this message ID.
         `--before`: Messages must come before this message ID.
 
@@ -1072,53 +1331,47 @@ class Mod(commands.Cog):
             await ctx.send(str(e))
             return
 
-        predicates = []
+        filters = MessageFilter(require_all=not args._or, negate=args._not)
         if args.bot:
-            predicates.append(args.bot)
+            filters.add(args.bot)
 
         if args.embeds:
-            predicates.append(args.embeds)
+            filters.add(args.embeds)
 
         if args.files:
-            predicates.append(args.files)
+            filters.add(args.files)
 
         if args.reactions:
-            predicates.append(args.reactions)
-
-        if args.emoji:
-            custom_emoji = re.compile(r'<:(\w+):(\d+)>')
-            predicates.append(lambda m: custom_emoji.search(m.content))
+            filters.add(args.reactions)
 
         if args.user:
-            users = []
+            users = set()
             converter = commands.MemberConverter()
             for u in args.user:
                 try:
                     user = await converter.convert(ctx, u)
-                    users.append(user)
+                    users.add(user.id)
                 except Exception as e:
                     await ctx.send(str(e))
                     return
 
-            predicates.append(lambda m: m.author in users)
-
-        if args.contains:
-            predicates.append(lambda m: any(sub in m.content for sub in args.contains))
+            filters.add(lambda m: m.author.id in users)
 
         if args.starts:
-            predicates.append(lambda m: any(m.content.startswith(s) for s in args.starts))
+            filters.starts(args.starts)
 
         if args.ends:
-            predicates.append(lambda m: any(m.content.endswith(s) for s in args.ends))
+            filters.ends(args.ends)
 
-        op = all if not args._or else any
-        def predicate(m):
-            r = op(p(m) for p in predicates)
-            if args._not:
-                return not r
-            return r
+        if args.contains:
+            filters.contains(args.contains)
+
+        if args.emoji:
+            filters.search(RE_CUSTOM_EMOJI)
+
+        predicate = filters.compile()
 
-        args.search = max(0, min(2000, args.search)) # clamp from 0-2000
+        args.search = max(0, min(PURGE_SEARCH_MAX, args.search)) # clamp from 0-PURGE_SEARCH_MAX
         await self.do_removal(ctx, args.search, predicate, before=args.before, after=args.after)
 
     @commands.command()
@@ -1128,8 +1381,10 @@ class Mod(commands.Cog):
         """
         Displays role information, or list of roles
         """
+        counts = await self.get_role_counts(ctx.guild)
+
         if role:
-            embed = discord.Embed(title=role.name, description=f'{len(role.members)} members', colour=role.colour)
+            embed = discord.Embed(title=role.name, description=f'{counts[role.id]} members', colour=role.colour)
             embed.add_field(name="ID", value=f'`{role.id}`')
             embed.add_field(name="Color", value=f'`{role.colour}`')
             embed.add_field(name="Display Separately", value=f'{role.hoist}')
@@ -1142,7 +1397,7 @@ class Mod(commands.Cog):
         else:
             embed = discord.Embed(title='Roles', description=f'{len(ctx.guild.roles)} total', colour=0x29B6F6)
             for role in ctx.guild.roles:
-                embed.add_field(name=f'{role.name}', value=f'{len(role.members)} members\nID: `{role.id}`')
+                embed.add_field(name=f'{role.name}', value=f'{counts[role.id]} members\nID: `{role.id}`')
             await ctx.send(embed=embed)
 
 def setup(bot):
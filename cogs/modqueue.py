@@ -1,35 +1,46 @@
-import re
+import asyncio
 import traceback
 import unicodedata
 
 from enum import Enum
-from typing import List, Optional, Text, Union
+from typing import Dict, List, NoReturn, Union
 from datetime import datetime, timedelta
-from asyncio import sleep
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 from motor.motor_asyncio import AsyncIOMotorCollection
-from pymongo import ReturnDocument
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
 
 from .utils import cache, checks
 from .utils.config import CogConfig
 from .utils.logging import CogLogger
+from .utils.paginator import CannotPaginate, CursorPages
+from .utils.spam import FloodDetector
+from .utils.terms import compile_terms, normalize
 
-banned = [
-    "nig(?:ga|ger)",
+TERMS = [
+    "nigga",
+    "nigger",
     "fag",
-    "(?<!bas)tard",
+    "tard",
     "jew",
-    "(?<!su)spic(?!y)",  # Matches `spic` but not `suspicious` or `spicy`
+    "spic",
     "chink",
     "gay",
     "queer",
     "fudgel" # super secret test word
 ]
 
-RE_TERMS = re.compile("(\w*(" + "|".join(banned) + ")\w*)", re.MULTILINE | re.IGNORECASE)
+# words that contain a term but shouldn't be flagged for it
+TERM_EXCEPTIONS = [
+    "bastard",
+    "suspic",  # suspicious, suspicion
+    "spicy"
+]
+
+# marks the strike summaries as built, in the migrations collection
+STRIKE_SUMMARY_MIGRATION = 'modqueue_strike_summaries'
 
 
 class ModQueueConfig(CogConfig):
@@ -38,6 +49,17 @@ class ModQueueConfig(CogConfig):
     enabled: bool = False
     queue_channel: discord.TextChannel
     log_channel: discord.TextChannel
+    flood_threshold: int = 0
+    flood_window: int = 60
+    flood_delete: bool = False
+    terms: List[str] = TERMS
+    term_exceptions: List[str] = TERM_EXCEPTIONS
+
+    def from_doc(self, doc: Dict) -> NoReturn:
+        super().from_doc(doc)
+
+        # only compiled when the lists change, guilds with the same lists share a matcher
+        self.matcher = compile_terms(self.terms, self.term_exceptions)
 
     @property
     def check(self):
@@ -88,7 +110,7 @@ class Action(Enum):
 
 
 class ModQueueItem(object):
-    __slots__ = ('_bot', '_collection', 'id', 'type', 'author_id', 'guild_id', 'message', 'matches', 'timestamp', 'edits', 'action', 'mod_id', 'action_timestamp', 'deleted_at', 'deleted_by_id')
+    __slots__ = ('_bot', '_collection', 'id', 'type', 'author_id', 'guild_id', 'message', 'matches', 'timestamp', 'edits', 'action', 'mod_id', 'action_timestamp', 'deleted_at', 'deleted_by_id', 'rendered')
 
     @classmethod
     def from_doc(cls, doc, bot: commands.Bot, collection):
@@ -122,6 +144,9 @@ class ModQueueItem(object):
         self.mod_id = doc.get('mod_id', None)
         self.action_timestamp = doc.get('action_timestamp', None)
 
+        # embed sections that only change when something happens to the item, see `render`
+        self.rendered = doc.get('rendered', {})
+
     @property
     def author(self) -> discord.User:
         return self._bot.get_user(self.author_id)
@@ -135,74 +160,97 @@ class ModQueueItem(object):
         return self._bot.get_user(self.deleted_by_id)
 
     @staticmethod
-    def check(message):
-        return RE_TERMS.findall(message.clean_content.strip())
-
-    async def embed(self) -> discord.Embed:
-        e = discord.Embed(color=self.action.color if self.action else 0xF44336)
-        e.description = ''
-        e.description += f'{self.author.mention} '
+    def check(message, matcher):
+        return matcher.findall(normalize(message.clean_content.strip()))
 
-        if not self.deleted_at and not self.action or self.action is Action.IGNORE:
-            e.description += f'[Jump to message](https://discordapp.com/channels/{self.guild.id}/{self.message.channel.id}/{self.message.id})'
+    @staticmethod
+    def render_edit(edit, number, timestamp, matcher) -> str:
+        td = edit['timestamp'] - timestamp
+        days = f'{td.days} days ' if td.days else ''
 
-        e.description += '\n\n'
+        matches = matcher.findall(normalize(edit['clean_content']))
+        flags = ", ".join(f'`{match[0]}`' for match in matches) if matches else "None"
 
-        if self.deleted_at:
-            td = self.deleted_at - self.timestamp
-            e.description += f'***MESSAGE WAS DELETED*** *({td.seconds/60:.0f} minutes)* '
-
-            if self.deleted_by:
-                e.description += f'*(by {self.deleted_by.mention})*'
+        return f'**__Edit {number}__** *({days}{td.seconds/60:.0f} minutes)*\nFlags: {flags}\n```{edit["clean_content"]}```\n'
 
-            e.description += '\n\n'
-
-        if self.edits:
-            for i, edit in enumerate(reversed(self.edits)):
-                td = edit.timestamp - self.timestamp
-                e.description += f'**__Edit {len(self.edits) - i}__** '
+    @staticmethod
+    def render_original(doc) -> str:
+        flags = ", ".join(f'`{match[0]}`' for match in doc['matches'])
+        return f'Flags: {flags}\n```{doc["message"]["clean_content"]}```'
 
-                e.description += '*('
-                if td.days:
-                    e.description += f'{td.days} days '
+    @staticmethod
+    def render_strikes(summary) -> str:
+        strikes = summary['strikes'] if summary else []
+        if not strikes:
+            return ''
+
+        lines = [f'\n**Previous Strikes ({len(strikes)})**']
+        for i, strike in enumerate(strikes):
+            lines.append(f'{i+1}. ' + ' '.join(f'`{term}` -' for term in strike['terms']) + f' {strike["timestamp"].strftime("%d %b %Y")}')
+
+        return '\n'.join(lines) + '\n'
+
+    async def render(self):
+        """Fills in any rendered sections the item is missing and saves them,
+        only items queued before sections were stored should need this.
+        """
+        missing = {}
+
+        if 'original' not in self.rendered:
+            missing['rendered.original'] = self.render_original({
+                'matches': self.matches,
+                'message': {'clean_content': self.message.clean_content}
+            })
+
+        edits = self.edits or []
+        if len(self.rendered.get('edits', [])) != len(edits):
+            config = await self._bot.get_cog('ModQueue').get_config(self.guild_id)
+            missing['rendered.edits'] = [
+                self.render_edit({'clean_content': edit.clean_content, 'timestamp': edit.timestamp}, number, self.timestamp, config.matcher)
+                for number, edit in enumerate(edits, 1)
+            ]
+
+        if 'strikes' not in self.rendered:
+            summary = await self._bot.db.modqueue_strikes.find_one({"guild_id": self.guild_id, "author_id": self.author_id})
+            missing['rendered.strikes'] = self.render_strikes(summary)
+
+        if not missing:
+            return
 
-                e.description += f'{td.seconds/60:.0f} minutes'
-                e.description += ')*\n'
+        for key, value in missing.items():
+            self.rendered[key.split('.')[1]] = value
 
-                e.description += f'Flags: '
-                matches = RE_TERMS.findall(edit.clean_content)
-                if matches:
-                    e.description += ", ".join(f'`{match[0]}`' for match in matches)
-                else:
-                    e.description += "None"
+        if self.id is not None:
+            await self._collection.update_one({'id': self.id}, {'$set': missing})
 
-                e.description += f'\n'
-                e.description += f'```{edit.clean_content}```'
+    async def embed(self) -> discord.Embed:
+        await self.render()
 
-                e.description += '\n'
+        e = discord.Embed(color=self.action.color if self.action else 0xF44336)
 
-            e.description += '**__Original__**\n'
+        parts = [f'{self.author.mention} ']
+        if not self.deleted_at and not self.action or self.action is Action.IGNORE:
+            parts.append(f'[Jump to message](https://discordapp.com/channels/{self.guild_id}/{self.message.channel_id}/{self.message.id})')
 
+        parts.append('\n\n')
 
-        e.description += f'Flags: '
-        e.description += ", ".join(f'`{match[0]}`' for match in self.matches)
+        if self.deleted_at:
+            td = self.deleted_at - self.timestamp
+            parts.append(f'***MESSAGE WAS DELETED*** *({td.seconds/60:.0f} minutes)* ')
 
-        e.description += '\n'
-        e.description += f'```{self.message.clean_content}```'
+            if self.deleted_by:
+                parts.append(f'*(by {self.deleted_by.mention})*')
 
-        strikes: List[ModQueueItem] = []
-        async for doc in self._collection.find({"guild_id": self.guild.id, "author_id": self.author.id, "action": Action.STRIKE.value}):
-            item = ModQueueItem.from_doc(doc, self._bot, self._collection)
-            if item.id == self.id:
-                pass
+            parts.append('\n\n')
 
-            strikes.append(item)
+        if self.edits:
+            parts.extend(reversed(self.rendered['edits']))
+            parts.append('**__Original__**\n')
 
-        if strikes:
-            e.description += f'\n**Previous Strikes ({len(strikes)})**\n'
-            for i, strike in enumerate(strikes):
-                e.description += f'{i+1}. ' + ' '.join(f'`{m[1]}` -' for m in strike.matches) + f' {strike.action_timestamp.strftime("%d %b %Y")}\n'
+        parts.append(self.rendered['original'])
+        parts.append(self.rendered['strikes'])
 
+        e.description = ''.join(parts)
         e.timestamp = datetime.now()
         e.set_author(name=f'{self.author.name}#{self.author.discriminator}', icon_url=self.author.avatar_url)
 
@@ -213,26 +261,68 @@ class ModQueueItem(object):
         await message.edit(embed=embed)
 
     async def submit_action(self, action, mod):
+        data = {
+            'action': action.value,
+            'mod_id': mod.id,
+            'action_timestamp': datetime.utcnow()
+        }
+
+        # the previous action tells us whether the strike summary needs to change
         doc = await self._collection.find_one_and_update(
             {'id': self.id},
-            {'$set': {
-                'action': action.value,
-                'mod_id': mod.id,
-                'action_timestamp': datetime.utcnow()
-            }},
-            return_document=ReturnDocument.AFTER
+            {'$set': data},
+            return_document=ReturnDocument.BEFORE
         )
 
+        previous = doc.get('action')
+        doc.update(data)
         self._from_doc(doc)
 
-    async def add_edit(self, message: discord.Message):
+        strikes = self._bot.db.modqueue_strikes
+        key = {'guild_id': self.guild_id, 'author_id': self.author_id}
+
+        if action is Action.STRIKE and previous != Action.STRIKE.value:
+            summary = await strikes.find_one_and_update(key, {
+                '$inc': {'count': 1},
+                '$push': {'strikes': ModQueueItem.strike_entry(doc)}
+            }, upsert=True, return_document=ReturnDocument.AFTER)
+
+        elif action is not Action.STRIKE and previous == Action.STRIKE.value:
+            summary = await strikes.find_one_and_update(key, {
+                '$inc': {'count': -1},
+                '$pull': {'strikes': {'id': self.id}}
+            }, return_document=ReturnDocument.AFTER)
+
+        else:
+            return
+
+        # every item for the member shows their strikes, so they all need the new section
+        rendered = ModQueueItem.render_strikes(summary)
+        self.rendered['strikes'] = rendered
+        await self._collection.update_many(key, {'$set': {'rendered.strikes': rendered}})
+
+    @staticmethod
+    def strike_entry(doc):
+        """What the strike summary keeps of a struck item, enough to list it in an embed."""
+        return {
+            'id': doc['id'],
+            'terms': [match[1] for match in doc['matches']],
+            'timestamp': doc['action_timestamp']
+        }
+
+    async def add_edit(self, message: discord.Message, matcher):
+        edit = {
+            'clean_content': message.clean_content,
+            'timestamp': message.edited_at
+        }
+
+        number = len(self.edits or []) + 1
+
         doc = await self._collection.find_one_and_update(
             {'id': self.id},
             {'$push': {
-                'edits': {
-                    'clean_content': message.clean_content,
-                    'timestamp': message.edited_at
-                }
+                'edits': edit,
+                'rendered.edits': ModQueueItem.render_edit(edit, number, self.timestamp, matcher)
             }},
             return_document=ReturnDocument.AFTER
         )
@@ -299,10 +389,28 @@ class ModQueueWrapper:
         self._bot = bot
         self._collection = collection
 
+        # IDs of every message in the queue, so edits and deletes of anything
+        # else don't need to ask the db
+        self.flagged = set()
+        self._loaded = False
+
+    async def load_flagged(self):
+        async for doc in self._collection.find({'message.id': {'$exists': True}}, {'_id': False, 'message.id': True}):
+            self.flagged.add(doc['message']['id'])
+
+        self._loaded = True
+
+    def is_flagged(self, message_id):
+        """Whether the message might be in the queue, always True until the IDs are loaded."""
+        return not self._loaded or message_id in self.flagged
+
     async def make(self, doc) -> ModQueueItem:
         return ModQueueItem.from_doc(doc, self._bot, self._collection)
 
     async def add(self, data):
+        if 'message' in data:
+            self.flagged.add(data['message']['id'])
+
         await self._collection.insert_one(data)
 
     async def find(self, **kwargs) -> Union[ModQueueItem, None]:
@@ -311,6 +419,24 @@ class ModQueueWrapper:
             return None
         return await self.make(doc)
 
+    async def set_deleted_many(self, message_ids) -> List[ModQueueItem]:
+        """Marks the items for every one of the messages as deleted, returns the ones that weren't already."""
+        docs = await self._collection.find({'message.id': {'$in': message_ids}, 'deleted_at': None}).to_list(None)
+        if not docs:
+            return []
+
+        now = datetime.utcnow()
+        await self._collection.update_many(
+            {'id': {'$in': [doc['id'] for doc in docs]}, 'deleted_at': None},
+            {'$set': {'deleted_at': now}}
+        )
+
+        items = [await self.make(doc) for doc in docs]
+        for item in items:
+            item.deleted_at = now
+
+        return items
+
 
 class ModQueue(commands.Cog):
     """ModQueue for flagged words"""
@@ -321,10 +447,48 @@ class ModQueue(commands.Cog):
 
         self.log = CogLogger('Penelope', self)
 
-        self.log.debug(RE_TERMS.pattern)
+        bot.indexes.declare(self.collection, [('id', ASCENDING)])
+        bot.indexes.declare(self.collection, [('message.id', ASCENDING)])
+        bot.indexes.declare(self.collection, [('guild_id', ASCENDING), ('author_id', ASCENDING), ('id', DESCENDING)])
+        bot.indexes.declare(self.collection, [('guild_id', ASCENDING), ('action', ASCENDING), ('id', DESCENDING)])
+        bot.indexes.declare(bot.db.modqueue_strikes, [('guild_id', ASCENDING), ('author_id', ASCENDING)], unique=True)
 
         self.queue = ModQueueWrapper(self.bot, self.collection)
 
+        self.floods = FloodDetector()
+
+        self.bot.loop.create_task(self.queue.load_flagged())
+        self.bot.loop.create_task(self.build_strike_summaries())
+
+    async def build_strike_summaries(self):
+        """Creates the strike summaries from the queue the first time the cog is loaded."""
+        await self.bot.wait_until_ready()
+
+        # strikes submitted before this runs already create summaries, so they can't tell whether it has
+        migrations = self.bot.db.migrations
+        if await migrations.find_one({'_id': STRIKE_SUMMARY_MIGRATION}):
+            return
+
+        summaries = {}
+        async for doc in self.collection.find({'action': Action.STRIKE.value}).sort('action_timestamp', ASCENDING):
+            summary = summaries.setdefault((doc['guild_id'], doc['author_id']), {'count': 0, 'strikes': []})
+            summary['count'] += 1
+            summary['strikes'].append(ModQueueItem.strike_entry(doc))
+
+        # rebuilt from the queue itself, so running this again gives the same result
+        if summaries:
+            await self.bot.db.modqueue_strikes.bulk_write([
+                UpdateOne({'guild_id': guild_id, 'author_id': author_id}, {'$set': summary}, upsert=True)
+                for (guild_id, author_id), summary in summaries.items()
+            ], ordered=False)
+            self.log.info(f'Built strike summaries for {len(summaries)} members')
+
+        await migrations.update_one(
+            {'_id': STRIKE_SUMMARY_MIGRATION},
+            {'$set': {'completed_at': datetime.utcnow()}},
+            upsert=True
+        )
+
     @cache.cache()
     async def get_config(self, guild_id) -> ModQueueConfig:
         return await ModQueueConfig.from_db(guild_id, self.bot)
@@ -400,6 +564,9 @@ class ModQueue(commands.Cog):
 
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload):
+        if not self.queue.is_flagged(payload.message_id):
+            return
+
         channel = self.bot.get_channel(payload.channel_id)
 
         if channel.guild is None:
@@ -417,7 +584,7 @@ class ModQueue(commands.Cog):
         if not message.edited_at:
             return
 
-        await item.add_edit(message)
+        await item.add_edit(message, config.matcher)
 
         message = await config.queue_channel.fetch_message(item.id)
         await item.refresh_embed(message)
@@ -427,6 +594,9 @@ class ModQueue(commands.Cog):
         if payload.guild_id is None:
             return
 
+        if not self.queue.is_flagged(payload.message_id):
+            return
+
         config = await self.get_config(payload.guild_id)
         if not config.check:
             return
@@ -435,23 +605,40 @@ class ModQueue(commands.Cog):
         if not item:
             return
 
-        await sleep(1) # allow the audit logs to catch up
-
-        deleted_by = None
         guild = self.bot.get_guild(payload.guild_id)
         after = datetime.utcnow() - timedelta(seconds=10)
-        async for entry in guild.audit_logs(action=discord.AuditLogAction.message_delete, limit=10): # this is shit but it should work most of the time
-            if not entry.created_at > after:
-                break
-            if entry.target.id == item.author.id and entry.extra.channel.id == item.message.channel.id:
-                deleted_by = entry.user
-                break
+        deleted_by = await self.bot.delete_audit.deleted_by(guild, item.author_id, item.message.channel_id, after=after)
 
         await item.set_deleted(deleted_by)
 
         message = await config.queue_channel.fetch_message(item.id)
         await item.refresh_embed(message)
 
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        if payload.guild_id is None:
+            return
+
+        message_ids = [i for i in payload.message_ids if self.queue.is_flagged(i)]
+        if not message_ids:
+            return
+
+        config = await self.get_config(payload.guild_id)
+        if not config.check:
+            return
+
+        items = await self.queue.set_deleted_many(message_ids)
+
+        # the queue messages are edited by id, no need to fetch them first
+        async def refresh(item):
+            try:
+                embed = await item.embed()
+                await self.bot.http.edit_message(config.queue_channel.id, item.id, embed=embed.to_dict())
+            except discord.NotFound:
+                pass
+
+        await asyncio.gather(*(refresh(item) for item in items))
+
     @commands.Cog.listener()
     async def on_message(self, message):
         if message.guild is None:
@@ -464,7 +651,12 @@ class ModQueue(commands.Cog):
         if not config.check:
             return
 
-        matches = ModQueueItem.check(message)
+        if config.flood_threshold:
+            flood = self.floods.add(message.guild.id, message, window=config.flood_window, threshold=config.flood_threshold)
+            if flood:
+                await self.handle_flood(config, message, *flood)
+
+        matches = ModQueueItem.check(message, config.matcher)
         if not matches:
             return
 
@@ -481,6 +673,13 @@ class ModQueue(commands.Cog):
             "timestamp": message.created_at
         }
 
+        summary = await self.bot.db.modqueue_strikes.find_one({"guild_id": message.guild.id, "author_id": message.author.id})
+        data['rendered'] = {
+            'original': ModQueueItem.render_original(data),
+            'edits': [],
+            'strikes': ModQueueItem.render_strikes(summary)
+        }
+
         item = await self.queue.make(data)
         e = await item.embed()
 
@@ -493,6 +692,43 @@ class ModQueue(commands.Cog):
 
         await self.queue.add(data)
 
+    async def handle_flood(self, config, message, sightings, first):
+        if config.flood_delete:
+            by_channel = {}
+            for s in sightings:
+                by_channel.setdefault(s.channel_id, []).append(discord.Object(id=s.message_id))
+
+            for channel_id, messages in by_channel.items():
+                channel = self.bot.get_channel(channel_id)
+                if channel is None:
+                    continue
+
+                try:
+                    await channel.delete_messages(messages)
+                except discord.HTTPException as e:
+                    self.log.debug(f'Failed to delete flood messages in {channel_id}: {e}')
+
+        # only the first message of a flood gets reported, the rest are just cleaned up
+        if not first:
+            return
+
+        authors = list(dict.fromkeys(s.author_id for s in sightings))
+        channels = list(dict.fromkeys(s.channel_id for s in sightings))
+
+        e = discord.Embed(color=0xFFB300)
+        e.description = f'**{len(sightings)} copies** from {len(authors)} accounts in {len(channels)} channels within {config.flood_window} seconds'
+        if config.flood_delete:
+            e.description += ' *(deleted)*'
+
+        # backticks would close the code block early
+        content = message.clean_content.replace('`', '\N{MODIFIER LETTER GRAVE ACCENT}')
+        e.description += f'\n```{content[:1000]}```'
+        e.add_field(name='Authors', value=' '.join(f'<@{a}>' for a in authors)[:1024])
+        e.add_field(name='Channels', value=' '.join(f'<#{c}>' for c in channels)[:1024])
+        e.timestamp = datetime.now()
+
+        await config.queue_channel.send('Copypasta flood detected', embed=e)
+
     @commands.Cog.listener()
     async def on_member_join(self, member):
         await self.check_member_identitity(member)
@@ -513,13 +749,13 @@ class ModQueue(commands.Cog):
             if not text:
                 continue
 
-            matches = RE_TERMS.findall(text)
+            matches = config.matcher.findall(normalize(text))
 
             if matches:
                 e = discord.Embed(color=0xF44336)
                 e.set_author(name=f'{member.name}#{member.discriminator}', icon_url=member.avatar_url)
                 e.description = f'{member.mention}\n'
-                e.description += f'`{"``".join(matches)}`\n'
+                e.description += f'`{"``".join(match[0] for match in matches)}`\n'
                 e.description += f'- Username: {member.name}#{member.discriminator}\n'
                 e.description += f'- Nickname: {member.nick}\n'
                 e.set_footer(text=f'User ID: {member.id}')
@@ -540,9 +776,61 @@ class ModQueue(commands.Cog):
         pass
 
     @modqueue.command(aliases=['c'])
-    async def config(self, ctx, param: Optional[Text], arg: Optional[Text]):
+    async def config(self, ctx, *args):
         config = await self.get_config(ctx.guild.id)
-        await config.handle_command(ctx, param, arg)
+        await config.handle_command(ctx, *args)
+
+    async def paginate_items(self, ctx, query, title, format_item):
+        """Pages through queue items matching `query`, newest first."""
+        count = await self.collection.count_documents(query)
+        if not count:
+            return await ctx.send('Nothing to show.')
+
+        projection = {'_id': False, 'id': True, 'author_id': True, 'matches': True, 'timestamp': True, 'action': True, 'action_timestamp': True, 'deleted_at': True}
+
+        async def fetch(*, after, skip, limit):
+            page_query = query if after is None else {**query, 'id': {'$lt': after}}
+            cursor = self.collection.find(page_query, projection).sort('id', DESCENDING).skip(skip).limit(limit)
+            return [(doc['id'], format_item(doc)) async for doc in cursor]
+
+        try:
+            pages = CursorPages(ctx, fetch=fetch, count=count, per_page=10)
+            pages.embed.title = title
+            await pages.paginate()
+        except CannotPaginate as e:
+            await ctx.send(e)
+
+    @modqueue.command()
+    async def pending(self, ctx):
+        """Lists queue items nobody has acted on yet."""
+        config = await self.get_config(ctx.guild.id)
+        if not config.check:
+            return await ctx.send('The mod queue is not set up in this server.')
+
+        def format_item(doc):
+            terms = ', '.join(f'`{match[1]}`' for match in doc['matches'])
+            deleted = ' *(deleted)*' if doc.get('deleted_at') else ''
+            return f'<@{doc["author_id"]}> {terms}{deleted} [Jump](https://discordapp.com/channels/{ctx.guild.id}/{config.queue_channel.id}/{doc["id"]})'
+
+        await self.paginate_items(ctx, {'guild_id': ctx.guild.id, 'action': None}, 'Pending', format_item)
+
+    @modqueue.command()
+    async def history(self, ctx, *, user: Union[discord.User, int]):
+        """Lists every queue item for a user.
+
+        Takes a raw ID too, for users the bot can't see anymore, like banned ones.
+        """
+        if isinstance(user, int):
+            user_id, name = user, f'user ID {user}'
+        else:
+            user_id, name = user.id, str(user)
+
+        def format_item(doc):
+            terms = ', '.join(f'`{match[1]}`' for match in doc['matches'])
+            action = Action(doc['action']).name.lower() if 'action' in doc else 'pending'
+            return f'{doc["timestamp"].strftime("%d %b %Y")} {terms} - {action}'
+
+        await self.paginate_items(ctx, {'guild_id': ctx.guild.id, 'author_id': user_id}, f'History for {name}', format_item)
 
 
 def setup(bot):
@@ -6,6 +6,8 @@ from typing import Union, Optional, Text
 import discord
 from discord.ext import commands
 
+from pymongo import ASCENDING
+
 from .utils import checks, cache
 from .utils.config import CogConfig
 from .utils.logging import CogLogger
@@ -105,6 +107,9 @@ class Reddiscord(commands.Cog):
         self.bot = bot
         self.db = bot.mongo.reddiscord
 
+        bot.indexes.declare(self.db.users, [('discord.id', ASCENDING)])
+        bot.indexes.declare(self.db.users, [('reddit.name', ASCENDING)])
+
         self.log = CogLogger('Penelope', self)
 
         self._task = bot.loop.create_task(self.monitor_db())
@@ -0,0 +1,208 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+
+from discord.ext import commands
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING
+
+from .utils.logging import CogLogger
+
+# how many of the soonest timers are kept in memory at once
+TIMER_BATCH_SIZE = 256
+
+# asyncio.sleep breaks down for very long delays, so cap each nap
+MAX_SLEEP = datetime.timedelta(days=40).total_seconds()
+
+
+class Timer:
+    __slots__ = ('id', 'event', 'args', 'kwargs', 'expires', 'created_at')
+
+    @classmethod
+    def from_doc(cls, doc):
+        self = cls()
+        self.id = doc['_id']
+        self.event = doc['event']
+        self.args = doc.get('args', [])
+        self.kwargs = doc.get('kwargs', {})
+        self.expires = doc['expires']
+        self.created_at = doc['created_at']
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, Timer) and self.id == other.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<Timer id={self.id} event={self.event} expires={self.expires}>'
+
+
+class Timers(commands.Cog):
+    """Persistent timers that dispatch `on_<event>_timer_complete` when they expire.
+
+    Only the soonest `TIMER_BATCH_SIZE` timers are held in memory, in a min-heap.
+    A single task sleeps until the head of the heap is due and is woken early
+    whenever a sooner timer is created. Timers that expired while the bot was
+    down are loaded first and dispatched straight away.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.collection: AsyncIOMotorCollection = bot.db.timers
+
+        self.log = CogLogger('Penelope', self)
+
+        bot.indexes.declare(self.collection, [('expires', ASCENDING)])
+
+        # (expires, tiebreaker, Timer)
+        self._heap = []
+        self._counter = itertools.count()
+        self._pending = set()
+
+        # everything due at or before this is in the heap, None means every pending timer is
+        self._horizon = None
+        self._loaded = False
+
+        self._wakeup = asyncio.Event()
+        self._task = bot.loop.create_task(self.dispatch_timers())
+
+    def cog_unload(self):
+        self._task.cancel()
+
+    def _push(self, timer):
+        # a timer created while a batch is loading can show up twice
+        if timer.id in self._pending:
+            return
+
+        self._pending.add(timer.id)
+        heapq.heappush(self._heap, (timer.expires, next(self._counter), timer))
+
+    def _pop(self):
+        _, _, timer = heapq.heappop(self._heap)
+        self._pending.discard(timer.id)
+        return timer
+
+    def _needs_load(self):
+        if not self._loaded:
+            return True
+
+        # past the horizon there may be timers in the db that aren't in the heap
+        if self._horizon is None:
+            return False
+
+        return not self._heap or self._heap[0][0] > self._horizon
+
+    async def _load_timers(self):
+        cursor = self.collection.find().sort('expires', ASCENDING).limit(TIMER_BATCH_SIZE)
+        docs = await cursor.to_list(length=TIMER_BATCH_SIZE)
+
+        for doc in docs:
+            self._push(Timer.from_doc(doc))
+
+        # a full batch means there could be more timers after the last one we got
+        self._horizon = docs[-1]['expires'] if len(docs) == TIMER_BATCH_SIZE else None
+        self._loaded = True
+
+        self.log.debug(f'Loaded {len(docs)} timers, horizon {self._horizon}')
+
+    async def dispatch_timers(self):
+        try:
+            await self.bot.wait_until_ready()
+
+            while not self.bot.is_closed():
+                if self._needs_load():
+                    await self._load_timers()
+
+                self._wakeup.clear()
+
+                if self._heap:
+                    expires, _, timer = self._heap[0]
+                    delay = (expires - datetime.datetime.utcnow()).total_seconds()
+
+                    if delay <= 0:
+                        self._pop()
+                        await self.call_timer(timer)
+                        continue
+
+                    timeout = min(delay, MAX_SLEEP)
+                else:
+                    timeout = None
+
+                # sleep until the head timer is due, or until a sooner one is created
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            self.log.error(f'Timer dispatch loop died: {e}')
+            self._task = self.bot.loop.create_task(self.dispatch_timers())
+
+    async def call_timer(self, timer):
+        await self.collection.delete_one({'_id': timer.id})
+        self.bot.dispatch(f'{timer.event}_timer_complete', timer)
+
+    async def create_timer(self, when, event, *args, **kwargs):
+        """Creates a timer.
+
+        Parameters
+        -----------
+        when: datetime.datetime
+            When the timer should fire, in UTC.
+        event: str
+            The name of the event to trigger.
+            Will transform to 'on_{event}_timer_complete'.
+        *args
+            Arguments to pass to the event
+        **kwargs
+            Keyword arguments to pass to the event
+
+        Returns
+        --------
+        Timer
+        """
+
+        now = datetime.datetime.utcnow()
+        doc = {
+            'event': event,
+            'args': list(args),
+            'kwargs': kwargs,
+            'expires': when,
+            'created_at': now
+        }
+
+        result = await self.collection.insert_one(doc)
+        doc['_id'] = result.inserted_id
+        timer = Timer.from_doc(doc)
+
+        # anything past the horizon gets picked up by a later batch
+        if not self._loaded or self._horizon is None or when <= self._horizon:
+            rearm = not self._heap or when < self._heap[0][0]
+            self._push(timer)
+
+            if rearm:
+                self._wakeup.set()
+
+        return timer
+
+    async def cancel_timer(self, timer):
+        """Deletes a pending timer so it never fires."""
+        await self.collection.delete_one({'_id': timer.id})
+
+        if timer.id not in self._pending:
+            return
+
+        self._heap = [entry for entry in self._heap if entry[2] != timer]
+        heapq.heapify(self._heap)
+        self._pending.discard(timer.id)
+
+
+def setup(bot):
+    bot.add_cog(Timers(bot))
@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import hashlib
+import os
+import tempfile
+import time
+
+import aiohttp
+
+from .downloads import CHUNK_SIZE
+
+import logging
+log = logging.getLogger('Penelope')
+
+class AttachmentArchive:
+    """Content addressed file store on disk.
+
+    Files are named after the sha256 of their contents, so the same file
+    posted in many messages is only stored once. Storing a file that is
+    already there just marks it as recently used.
+
+    `prune` deletes files not used for `retention` seconds, then the least
+    recently used ones until the store fits in `max_bytes`.
+
+    Parameters
+    ------------
+    root: str
+        The directory files are kept in, created if needed.
+    max_bytes: int
+        How big the store can get.
+    retention: float
+        How long a file is kept after it was last stored, in seconds.
+    """
+
+    def __init__(self, root, *, max_bytes, retention):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.retention = retention
+
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def open(self, digest):
+        """Opens an archived file for reading, or returns None if it isn't archived."""
+        try:
+            return open(self.path(digest), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def _commit(self, tmp_path, digest):
+        path = self.path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            os.utime(path)
+            return
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _sync(fp):
+        fp.flush()
+        os.fsync(fp.fileno())
+
+    async def store(self, session, url, *, max_size):
+        """Downloads a URL into the archive.
+
+        Returns the file's sha256 hex digest, or None if the download failed,
+        was bigger than `max_size` bytes or couldn't be written.
+        """
+        loop = asyncio.get_event_loop()
+        digest = hashlib.sha256()
+        size = 0
+        tmp_path = None
+
+        # disk work runs in the executor, a slow or full disk shouldn't stall the bot
+        try:
+            fd, tmp_path = await loop.run_in_executor(None, functools.partial(tempfile.mkstemp, dir=os.path.join(self.root, 'tmp')))
+            with os.fdopen(fd, 'wb') as fp:
+                async with session.get(url) as resp:
+                    if resp.status != 200:
+                        raise ValueError(f'status {resp.status}')
+
+                    async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > max_size:
+                            raise ValueError('too large')
+
+                        digest.update(chunk)
+                        await loop.run_in_executor(None, fp.write, chunk)
+
+                await loop.run_in_executor(None, self._sync, fp)
+
+            digest = digest.hexdigest()
+            await loop.run_in_executor(None, self._commit, tmp_path, digest)
+            tmp_path = None
+            return digest
+
+        except (ValueError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.debug(f'{self.__class__.__name__} - Not archiving {url}: {e}')
+            return None
+
+        except OSError as e:
+            log.error(f'{self.__class__.__name__} - Failed to archive {url}: {e}')
+            return None
+
+        finally:
+            # anything left here never made it into the archive
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _prune(self):
+        files = []
+        for directory, _, names in os.walk(self.root):
+            if os.path.basename(directory) == 'tmp':
+                continue
+
+            for name in names:
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        # least recently stored first
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        expired = time.time() - self.retention
+        removed = freed = 0
+
+        for mtime, size, path in files:
+            if mtime >= expired and total <= self.max_bytes:
+                break
+
+            os.remove(path)
+            total -= size
+            removed += 1
+            freed += size
+
+        return removed, freed, total
+
+    async def prune(self):
+        """Applies the retention and size budget, returns ``(files removed, bytes freed, bytes left)``."""
+        return await asyncio.get_event_loop().run_in_executor(None, self._prune)
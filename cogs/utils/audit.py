@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import discord
+
+import logging
+log = logging.getLogger('Penelope')
+
+class MessageDeleteAudit:
+    """Works out who deleted a message from each guild's recent message_delete
+    audit log entries.
+
+    Lookups don't fetch the audit log themselves. The first one for a guild
+    schedules a fetch `delay` seconds later, giving Discord time to write the
+    entry, and every lookup for that guild arriving before it starts waits on
+    the same fetch. Fetches for a guild are at least `window` seconds apart.
+    Entries are indexed by (target, channel), so a lookup is a dict probe.
+    """
+
+    def __init__(self, *, delay=1.0, window=2.0, limit=100):
+        self.delay = delay
+        self.window = window
+        self.limit = limit
+
+        # guild_id: future for the next fetch, until it starts
+        self._pending = {}
+        # guild_id: when the last fetch started
+        self._last_fetch = {}
+
+    async def _fetch(self, guild, future):
+        now = time.monotonic()
+        wait = max(self.delay, self._last_fetch.get(guild.id, 0) + self.window - now)
+        await asyncio.sleep(wait)
+
+        # anyone asking from here on might not be in this fetch, they get the next one
+        del self._pending[guild.id]
+        self._last_fetch[guild.id] = time.monotonic()
+
+        # (target_id, channel_id): newest entry
+        entries = {}
+        try:
+            async for entry in guild.audit_logs(action=discord.AuditLogAction.message_delete, limit=self.limit):
+                entries.setdefault((entry.target.id, entry.extra.channel.id), entry)
+
+        except discord.HTTPException as e:
+            log.debug(f'{self.__class__.__name__} - Could not fetch audit logs for {guild.id}: {e}')
+
+        except Exception as e:
+            future.set_exception(e)
+            return
+
+        future.set_result(entries)
+
+    async def deleted_by(self, guild, author_id, channel_id, *, after=None):
+        """Returns who deleted a message by `author_id` in `channel_id`, or None
+        if it looks like they deleted it themselves.
+
+        `after` ignores entries created before then, in UTC.
+        """
+        future = self._pending.get(guild.id)
+        if future is None:
+            future = asyncio.get_event_loop().create_future()
+            self._pending[guild.id] = future
+            asyncio.ensure_future(self._fetch(guild, future))
+
+        entries = await asyncio.shield(future)
+
+        entry = entries.get((author_id, channel_id))
+        if entry is None:
+            return None
+
+        if after is not None and entry.created_at <= after:
+            return None
+
+        return entry.user
@@ -0,0 +1,97 @@
+from collections import deque
+
+class Automaton:
+    """Aho-Corasick automaton that finds every occurrence of a set of
+    strings in a single pass over the text.
+
+    Failure links are folded into the transition table when it is built,
+    so scanning is one dict lookup per character with no backtracking.
+
+    Parameters
+    ------------
+    patterns: Iterable[str]
+        The strings to look for. Duplicates and empty strings are ignored.
+    ignore_case: bool
+        Whether matching is case insensitive. The text is lowercased
+        before scanning, so `str.lower` must not change its length.
+    """
+
+    __slots__ = ('patterns', 'ignore_case', '_delta', '_outputs')
+
+    def __init__(self, patterns, *, ignore_case=False):
+        self.ignore_case = ignore_case
+
+        patterns = (p.lower() if ignore_case else p for p in patterns)
+        self.patterns = tuple(dict.fromkeys(p for p in patterns if p))
+
+        # trie
+        goto = [{}]
+        outputs = [()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    outputs.append(())
+                state = nxt
+            outputs[state] += (index,)
+
+        # breadth first, so a state's failure target is always finished before it
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])]
+        delta.extend({} for _ in range(len(goto) - 1))
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] += outputs[fail[state]]
+
+            # inherit the failure state's transitions, then override with our own
+            table = dict(delta[fail[state]])
+            for char, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(char, 0)
+                table[char] = nxt
+                queue.append(nxt)
+
+            delta[state] = table
+
+        self._delta = delta
+        self._outputs = outputs
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def search(self, text):
+        """Whether any pattern occurs in the text."""
+        if self.ignore_case:
+            text = text.lower()
+
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                return True
+        return False
+
+    def finditer(self, text):
+        """Yields ``(start, end, index)`` for every occurrence, ordered by end
+        position, where ``index`` is the pattern's position in `patterns`.
+
+        Overlapping occurrences are all reported.
+        """
+        if self.ignore_case:
+            text = text.lower()
+
+        delta = self._delta
+        outputs = self._outputs
+        patterns = self.patterns
+        state = 0
+        for end, char in enumerate(text, 1):
+            state = delta[state].get(char, 0)
+            for index in outputs[state]:
+                yield end - len(patterns[index]), end, index
@@ -0,0 +1,119 @@
+import asyncio
+
+from discord.guild import BanEntry
+
+class _GuildBans:
+    __slots__ = ('by_id', 'by_name')
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_name = {}
+
+    def add(self, entry):
+        self.discard(entry.user.id)
+        self.by_id[entry.user.id] = entry
+        self.by_name[str(entry.user)] = entry
+
+    def discard(self, user_id):
+        entry = self.by_id.pop(user_id, None)
+        if entry is not None and self.by_name.get(str(entry.user)) is entry:
+            del self.by_name[str(entry.user)]
+
+class BanCache:
+    """Each guild's ban list, indexed by user ID and by Name#Discrim.
+
+    A guild's bans are downloaded once, the first time they're looked up, and
+    are then kept current from ban and unban events. Events that arrive while
+    the download is still running are replayed on top of it, so the download
+    can't bring back someone who was just unbanned.
+
+    Events missed while disconnected can't be replayed after a fresh connect,
+    so everything is dropped with `clear` on ready and downloaded again when
+    next needed. A resume replays them, the cache stays.
+    """
+
+    def __init__(self):
+        # guild_id: _GuildBans
+        self._guilds = {}
+
+        # guild_id: (asyncio.Task, [(banned, user)]) for downloads in progress
+        self._loading = {}
+
+        # bumped by `clear`, so downloads started before then aren't kept
+        self._generation = 0
+
+    async def _load(self, guild):
+        generation = self._generation
+        try:
+            bans = await guild.bans()
+        except:
+            del self._loading[guild.id]
+            raise
+
+        _, events = self._loading.pop(guild.id)
+
+        cache = _GuildBans()
+        for entry in bans:
+            cache.add(entry)
+
+        for banned, user in events:
+            if banned:
+                cache.add(BanEntry(reason=None, user=user))
+            else:
+                cache.discard(user.id)
+
+        if generation == self._generation:
+            self._guilds[guild.id] = cache
+        return cache
+
+    async def _get(self, guild):
+        cache = self._guilds.get(guild.id)
+        if cache is not None:
+            return cache
+
+        # share one download between everyone looking up the same guild
+        if guild.id not in self._loading:
+            self._loading[guild.id] = (asyncio.ensure_future(self._load(guild)), [])
+
+        task, _ = self._loading[guild.id]
+        return await asyncio.shield(task)
+
+    async def get(self, guild, user_id):
+        """Returns the `discord.guild.BanEntry` for a user ID, or None if they aren't banned."""
+        cache = await self._get(guild)
+        return cache.by_id.get(user_id)
+
+    async def get_named(self, guild, name):
+        """Returns the `discord.guild.BanEntry` for a Name#Discrim, or None if they aren't banned."""
+        cache = await self._get(guild)
+        return cache.by_name.get(name)
+
+    def _event(self, guild, user, banned):
+        loading = self._loading.get(guild.id)
+        if loading is not None:
+            loading[1].append((banned, user))
+
+        cache = self._guilds.get(guild.id)
+        if cache is None:
+            return
+
+        if banned:
+            # the ban event doesn't carry the reason, keep the one we already have
+            if user.id not in cache.by_id:
+                cache.add(BanEntry(reason=None, user=user))
+        else:
+            cache.discard(user.id)
+
+    def banned(self, guild, user):
+        self._event(guild, user, True)
+
+    def unbanned(self, guild, user):
+        self._event(guild, user, False)
+
+    def clear(self, guild_id=None):
+        if guild_id is not None:
+            self._guilds.pop(guild_id, None)
+            return
+
+        self._guilds.clear()
+        self._generation += 1
@@ -0,0 +1,180 @@
+import asyncio
+
+from collections import deque
+
+import discord
+
+import logging
+log = logging.getLogger('Penelope')
+
+# discord's limits for a single message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+MAX_FILES = 10
+
+WEBHOOK_NAME = 'Penelope Log'
+
+class _Channel:
+    __slots__ = ('channel', 'pending', 'task', 'embeds', 'messages')
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = deque()
+        self.task = None
+
+        # totals sent, to see how well embeds are being grouped
+        self.embeds = 0
+        self.messages = 0
+
+class Broadcaster:
+    """Per-channel outbound queue that groups embeds into as few messages as it can.
+
+    `send` only queues the embed. The first embed queued for an idle channel
+    waits `window` seconds for company, then everything pending goes out in
+    messages of up to 10 embeds and 6000 characters, one after another, until
+    the queue is empty. Embeds that pile up behind a rate limit are simply sent
+    in fuller messages.
+
+    Only webhooks can send more than one embed per message, so one is created
+    in each channel when the bot has Manage Webhooks. Otherwise the embeds are
+    sent one message at a time, as before.
+
+    Parameters
+    ------------
+    window: float
+        How long the first embed waits for others, in seconds.
+    """
+
+    def __init__(self, *, window=1.0):
+        self.window = window
+
+        # channel id: _Channel
+        self._channels = {}
+
+        # channel id: discord.Webhook, or None when the bot can't make one
+        self._webhooks = {}
+
+    def __len__(self):
+        return sum(len(c.pending) for c in self._channels.values())
+
+    def depth(self, channel_id):
+        """How many embeds are waiting to be sent to a channel."""
+        queue = self._channels.get(channel_id)
+        return len(queue.pending) if queue else 0
+
+    def stats(self, channel_id):
+        """Returns ``(pending, embeds sent, messages sent)`` for a channel."""
+        queue = self._channels.get(channel_id)
+        if queue is None:
+            return 0, 0, 0
+        return len(queue.pending), queue.embeds, queue.messages
+
+    def send(self, channel, embed, *, files=None):
+        """Queues an embed, and any files to go with it, for a channel."""
+        queue = self._channels.get(channel.id)
+        if queue is None:
+            queue = self._channels[channel.id] = _Channel(channel)
+
+        # the channel object can be replaced when it's updated
+        queue.channel = channel
+        queue.pending.append((embed, files or []))
+
+        if queue.task is None:
+            queue.task = asyncio.ensure_future(self._drain(queue))
+
+    def _next_batch(self, pending):
+        embeds = []
+        files = []
+        size = 0
+
+        while pending and len(embeds) < MAX_EMBEDS:
+            embed, attached = pending[0]
+
+            # the upload limit is per message, so only one embed's files go in each
+            if embeds and (size + len(embed) > MAX_EMBED_CHARS or (attached and files)):
+                break
+
+            pending.popleft()
+            embeds.append(embed)
+            files.extend(attached)
+            size += len(embed)
+
+        return embeds, files
+
+    async def _webhook(self, channel):
+        if channel.id in self._webhooks:
+            return self._webhooks[channel.id]
+
+        webhook = None
+        me = channel.guild.me
+
+        if channel.permissions_for(me).manage_webhooks:
+            try:
+                for hook in await channel.webhooks():
+                    if hook.user == me and hook.token:
+                        webhook = hook
+                        break
+                else:
+                    webhook = await channel.create_webhook(name=WEBHOOK_NAME)
+
+            except discord.HTTPException as e:
+                log.warning(f'Could not get a webhook for channel {channel.id}: {e}')
+
+        self._webhooks[channel.id] = webhook
+        return webhook
+
+    async def _deliver(self, channel, embeds, files):
+        webhook = await self._webhook(channel)
+
+        if webhook is not None:
+            me = channel.guild.me
+            try:
+                await webhook.send(embeds=embeds, files=files or None, username=me.display_name, avatar_url=str(me.avatar_url))
+                return 1
+
+            except discord.NotFound:
+                # deleted from under us, fall back to the channel until it can be remade
+                self._webhooks.pop(channel.id, None)
+
+                # the failed attempt already read the files
+                for f in files:
+                    f.reset()
+
+        for embed in embeds[:-1]:
+            await channel.send(embed=embed)
+        await channel.send(embed=embeds[-1], files=files or None)
+        return len(embeds)
+
+    async def _drain(self, queue):
+        try:
+            await asyncio.sleep(self.window)
+
+            while queue.pending:
+                embeds, files = self._next_batch(queue.pending)
+
+                try:
+                    queue.messages += await self._deliver(queue.channel, embeds, files)
+                    queue.embeds += len(embeds)
+
+                except Exception as e:
+                    # keep draining, one bad batch shouldn't stall the channel
+                    log.error(f'Failed to broadcast {len(embeds)} embeds to channel {queue.channel.id}: {e}')
+
+                finally:
+                    # discord.File leaves files it didn't open itself open
+                    for f in files:
+                        f.close()
+                        f.fp.close()
+
+        finally:
+            queue.task = None
+
+    def forget(self, channel_id):
+        """Drops a channel's cached webhook, so the next send looks it up again."""
+        self._webhooks.pop(channel_id, None)
+
+    async def close(self):
+        """Waits for everything queued to be sent."""
+        tasks = [c.task for c in self._channels.values() if c.task is not None]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,122 @@
+import asyncio
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+
+import logging
+log = logging.getLogger('Penelope')
+
+# how many flushes in a row a batch is retried for while the db can't be reached
+MAX_RETRIES = 30
+
+class BulkWriter:
+    """Write-behind buffer that sends a collection's writes in batches.
+
+    Writes are queued in the order they're made and sent as ordered
+    `bulk_write` calls, one batch at a time, so an update is never applied
+    before an insert queued ahead of it. A batch goes out once `batch_size`
+    writes are waiting, or every `interval` seconds otherwise.
+
+    Once `max_pending` writes are waiting, new writes wait for the buffer to
+    be flushed instead of growing it further.
+
+    A batch that fails because the db can't be reached (a failover, a network
+    timeout) is put back and retried on the following flushes, up to
+    `MAX_RETRIES` times, before it's dropped.
+
+    Parameters
+    ------------
+    collection: motor.motor_asyncio.AsyncIOMotorCollection
+        Where the writes go.
+    batch_size: int
+        How many writes to send at once.
+    interval: float
+        The longest a write waits in the buffer, in seconds.
+    max_pending: int
+        How many writes can be buffered before writers have to wait.
+    """
+
+    def __init__(self, collection, *, batch_size=500, interval=1.0, max_pending=5000):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+
+        self._ops = []
+        self._retries = 0
+        self._lock = asyncio.Lock()
+        self._task = asyncio.ensure_future(self._flush_periodically())
+
+    def __len__(self):
+        return len(self._ops)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+
+            # whatever goes wrong, the next interval still flushes
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f'{self.__class__.__name__} - Periodic flush of {self.collection.full_name} failed: {e}')
+
+    async def _add(self, op):
+        # backpressure, let the db catch up before buffering more
+        if len(self._ops) >= self.max_pending:
+            await self.flush()
+
+        self._ops.append(op)
+
+        if len(self._ops) >= self.batch_size and not self._lock.locked():
+            asyncio.ensure_future(self.flush())
+
+    async def insert(self, doc):
+        await self._add(InsertOne(doc))
+
+    async def update(self, filter, update, *, upsert=False):
+        await self._add(UpdateOne(filter, update, upsert=upsert))
+
+    async def flush(self):
+        """Sends everything buffered so far, returns once it's written."""
+        async with self._lock:
+            while self._ops:
+                batch = self._ops[:self.batch_size]
+                del self._ops[:self.batch_size]
+
+                try:
+                    await self.collection.bulk_write(batch, ordered=True)
+                    self._retries = 0
+                except BulkWriteError as e:
+                    # an ordered bulk write stops at the first error, retry everything after it
+                    failed = e.details['writeErrors'][0]
+                    log.error(f'{self.__class__.__name__} - Write to {self.collection.full_name} failed: {failed["errmsg"]}')
+                    self._ops[:0] = batch[failed['index'] + 1:]
+                except ConnectionFailure as e:
+                    # covers AutoReconnect and NetworkTimeout, try again next flush
+                    self._retries += 1
+                    if self._retries > MAX_RETRIES:
+                        log.error(f'{self.__class__.__name__} - Dropped {len(batch)} writes to {self.collection.full_name} after {MAX_RETRIES} retries: {e}')
+                        self._retries = 0
+                        continue
+
+                    log.warning(f'{self.__class__.__name__} - Write to {self.collection.full_name} failed, retrying next flush: {e}')
+                    self._ops[:0] = batch
+                    return
+                except PyMongoError as e:
+                    log.error(f'{self.__class__.__name__} - Dropped {len(batch)} writes to {self.collection.full_name}: {e}')
+                except Exception as e:
+                    # e.g. one op that can't be encoded, write them one by one so only that one is lost
+                    log.error(f'{self.__class__.__name__} - Batch write to {self.collection.full_name} failed, retrying one at a time: {e}')
+                    await self._write_each(batch)
+
+    async def _write_each(self, batch):
+        for op in batch:
+            try:
+                await self.collection.bulk_write([op], ordered=True)
+            except Exception as e:
+                log.error(f'{self.__class__.__name__} - Dropped write to {self.collection.full_name}: {e}')
+
+    async def close(self):
+        """Stops the periodic flush and writes out whatever is left."""
+        self._task.cancel()
+        await self.flush()
@@ -5,6 +5,7 @@ import inspect
 import asyncio
 import enum
 import time
+import heapq
 
 from functools import wraps
 
@@ -126,3 +127,67 @@ def cache(maxsize=128, strategy=Strategy.lru, ignore_kwargs=False):
         wrapper.invalidate_containing = _invalidate_containing
         return wrapper
     return decorator
+
+class ExpiringMap:
+    """Maps keys to a deadline, after which the key is treated as absent.
+
+    Probes are a single dict lookup. Expired keys are evicted lazily, in
+    deadline order, from a heap whenever the map is written to or a probe
+    finds an expired key.
+    """
+
+    def __init__(self, ttl=None, *, clock=time.monotonic):
+        self._ttl = ttl
+        self._clock = clock
+        self._deadlines = {}
+        self._heap = []
+
+    def _evict(self, now):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            # the key may have been refreshed or removed since this entry was pushed
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+
+    def set(self, key, deadline=None):
+        now = self._clock()
+        if deadline is None:
+            deadline = now + self._ttl
+
+        self._evict(now)
+        if deadline <= now:
+            self._deadlines.pop(key, None)
+            return
+
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    def get(self, key, default=None):
+        deadline = self._deadlines.get(key)
+        if deadline is None:
+            return default
+
+        now = self._clock()
+        if deadline <= now:
+            self._evict(now)
+            return default
+
+        return deadline
+
+    def pop(self, key, default=None):
+        deadline = self._deadlines.pop(key, None)
+        if deadline is None or deadline <= self._clock():
+            return default
+        return deadline
+
+    def clear(self):
+        self._deadlines.clear()
+        self._heap.clear()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        self._evict(self._clock())
+        return len(self._deadlines)
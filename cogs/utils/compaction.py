@@ -0,0 +1,65 @@
+import bson
+import zstandard
+
+from bson.binary import Binary
+
+# the parts of a logged message worth compressing, everything else is ids and
+# timestamps that queries need to see
+COMPRESSED_FIELDS = ('content', 'clean_content', 'edits')
+
+COMPRESSION_LEVEL = 10
+
+def compact(docs, *, level=COMPRESSION_LEVEL):
+    """Compresses the text of logged message documents.
+
+    The fields in `COMPRESSED_FIELDS` are encoded as one BSON document and
+    zstd compressed into ``compressed``. Documents that wouldn't get any
+    smaller are left as they are. Every document is marked ``compacted``
+    either way, so it isn't looked at again.
+
+    Meant to be run in an executor, it's CPU bound.
+
+    Returns
+    --------
+    List[Tuple[dict, dict, int, int]]
+        ``(doc, update, raw size, stored size)`` for each document.
+    """
+    compressor = zstandard.ZstdCompressor(level=level)
+    results = []
+
+    for doc in docs:
+        fields = {f: doc[f] for f in COMPRESSED_FIELDS if f in doc}
+        raw = bson.encode(fields)
+        packed = compressor.compress(raw)
+
+        if len(packed) < len(raw):
+            update = {
+                '$set': {'compressed': Binary(packed), 'compacted': True},
+                '$unset': {f: '' for f in fields}
+            }
+            results.append((doc, update, len(raw), len(packed)))
+
+        else:
+            update = {'$set': {'compacted': True}}
+            results.append((doc, update, len(raw), len(raw)))
+
+    return results
+
+def expand(doc):
+    """Returns a logged message document with its compressed fields restored.
+
+    Edits logged after the document was compacted are written next to the
+    compressed copy, so they're put back on top of it.
+    """
+    if doc is None or 'compressed' not in doc:
+        return doc
+
+    fields = bson.decode(zstandard.ZstdDecompressor().decompress(doc['compressed']))
+
+    newer = {k: v for k, v in doc.items() if k != 'compressed'}
+
+    doc = {**fields, **newer}
+    if 'edits' in fields or 'edits' in newer:
+        doc['edits'] = fields.get('edits', []) + newer.get('edits', [])
+
+    return doc
@@ -56,9 +56,13 @@ class CogConfig(ABC):
             param = list(map(int, param_id.split(':')))
             return self._bot.get_channel(param[0]).fetch_message(param[1])
 
-        else:
+        elif issubclass(hint, discord.abc.Snowflake):
             log.warning(f'{self.__class__.__name__} - {hint} not implemented in __getattr__')
 
+        else:
+            # plain values are stored as they are
+            return param_id
+
 
     @property
     def _embed(self) -> discord.Embed:
@@ -87,13 +91,16 @@ class CogConfig(ABC):
 
                     singlearg = await self._convert_argument(ctx, hint, args, param)
 
-                    arg = getattr(self, param)
+                    # copy, plain lists would otherwise be the class default shared by every guild
+                    arg = list(getattr(self, param))
 
                     if action == 'add':
                         if not singlearg in arg:
                             arg.append(singlearg)
 
                     elif action == 'remove':
+                        if not singlearg in arg:
+                            raise BadArgument(f'`{singlearg}` is not in {param}')
                         arg.remove(singlearg)
 
                     else:
@@ -186,7 +193,9 @@ class CogConfig(ABC):
         if typing.get_origin(hint) is list:
             hint = typing.get_args(hint)[0]
 
-            return f'{self._make_key(param, hint)}s'
+            # lists of discord objects are stored as `<param>_ids`, anything else under the param name
+            if issubclass(hint, discord.abc.Snowflake):
+                return f'{self._make_key(param, hint)}s'
 
         return self._make_key(param, hint)
 
@@ -0,0 +1,66 @@
+import asyncio
+import io
+import tempfile
+
+import aiohttp
+
+# read this much at a time
+CHUNK_SIZE = 256 * 1024
+
+# downloads bigger than this spill from memory onto disk
+SPOOL_MEMORY = 2 * 1024 * 1024
+
+async def download(session, url, *, max_size, chunk_size=CHUNK_SIZE):
+    """Streams a URL into memory, spilling into a temporary file once it
+    passes `SPOOL_MEMORY` bytes.
+
+    This is what `tempfile.SpooledTemporaryFile` does, but that isn't an
+    `io.IOBase` before python 3.11 so `discord.File` won't take it.
+
+    Returns the file, rewound, or None if the download failed or turned out
+    to be bigger than `max_size` bytes. The caller has to close the file.
+    """
+    try:
+        async with session.get(url) as resp:
+            if resp.status != 200:
+                return None
+
+            if resp.content_length is not None and resp.content_length > max_size:
+                return None
+
+            fp = io.BytesIO()
+            size = 0
+
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    fp.close()
+                    return None
+
+                if size > SPOOL_MEMORY and isinstance(fp, io.BytesIO):
+                    spilled = tempfile.TemporaryFile()
+                    spilled.write(fp.getbuffer())
+                    fp.close()
+                    fp = spilled
+
+                fp.write(chunk)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+    fp.seek(0)
+    return fp
+
+async def download_all(session, urls, *, max_size, concurrency=4):
+    """Downloads several URLs at once, at most `concurrency` at a time.
+
+    Returns a list in the same order as `urls`, with None for every
+    download that failed or was too big.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(url):
+        async with semaphore:
+            return await download(session, url, max_size=max_size)
+
+    return await asyncio.gather(*(limited(url) for url in urls))
@@ -0,0 +1,96 @@
+from .automaton import Automaton
+
+# Below this many substrings, looping over `str.__contains__` (which runs in C)
+# is faster than walking the automaton in python. See dev_scripts/bench_message_filters.py
+AUTOMATON_THRESHOLD = 96
+
+def contains_any(substrings):
+    """Returns a function that checks whether a string contains any of the substrings."""
+    substrings = tuple(dict.fromkeys(s for s in substrings if s))
+
+    if len(substrings) >= AUTOMATON_THRESHOLD:
+        return Automaton(substrings).search
+
+    if len(substrings) == 1:
+        sub, = substrings
+        return lambda content: sub in content
+
+    def contains(content):
+        for sub in substrings:
+            if sub in content:
+                return True
+        return False
+    return contains
+
+class MessageFilter:
+    """Builds a single predicate out of message filter options.
+
+    Checks that only look at message fields (author, embeds, attachments...)
+    always run before the ones that have to scan the message content, so
+    scanning is skipped entirely whenever a cheap check settles the result.
+
+    Parameters
+    ------------
+    require_all: bool
+        Whether every check must pass, otherwise any passing check is enough.
+    negate: bool
+        Whether to invert the final result.
+    """
+
+    def __init__(self, *, require_all=True, negate=False):
+        self.require_all = require_all
+        self.negate = negate
+        self._cheap = []
+        self._content = []
+
+    def __bool__(self):
+        return bool(self._cheap or self._content)
+
+    def add(self, predicate):
+        """Adds a check that doesn't touch the message content."""
+        self._cheap.append(predicate)
+
+    def add_content(self, predicate):
+        """Adds a check on the message content, ``predicate`` is called with the content string."""
+        self._content.append(predicate)
+
+    def contains(self, substrings):
+        self.add_content(contains_any(substrings))
+
+    def starts(self, prefixes):
+        prefixes = tuple(prefixes)
+        self.add_content(lambda content: content.startswith(prefixes))
+
+    def ends(self, suffixes):
+        suffixes = tuple(suffixes)
+        self.add_content(lambda content: content.endswith(suffixes))
+
+    def search(self, regex):
+        self.add_content(regex.search)
+
+    def match(self, regex):
+        self.add_content(regex.match)
+
+    def compile(self):
+        """Returns the predicate, which takes a `discord.Message`."""
+        cheap = tuple(self._cheap)
+        content = tuple(self._content)
+        negate = self.negate
+
+        # `all` stops on the first failing check, `any` on the first passing one
+        stop_on = not self.require_all
+
+        def predicate(message):
+            for check in cheap:
+                if bool(check(message)) is stop_on:
+                    return stop_on is not negate
+
+            if content:
+                text = message.content
+                for check in content:
+                    if bool(check(text)) is stop_on:
+                        return stop_on is not negate
+
+            return (not stop_on) is not negate
+
+        return predicate
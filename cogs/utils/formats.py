@@ -22,6 +22,16 @@ def human_join(seq, delim=', ', final='or'):
 
     return delim.join(seq[:-1]) + f' {final} {seq[-1]}'
 
+def human_size(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024:
+            break
+        size /= 1024
+    else:
+        unit = 'TiB'
+
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+
 class TabularData:
     def __init__(self):
         self._widths = []
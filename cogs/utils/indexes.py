@@ -0,0 +1,87 @@
+import asyncio
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure
+
+import logging
+log = logging.getLogger('Penelope')
+
+class IndexRegistry:
+    """Indexes the bot's queries rely on, declared by the cogs that run them.
+
+    Everything declared before `ensure` is called is created at once, each
+    collection's indexes in a single `createIndexes` and all collections
+    concurrently. Anything declared afterwards (e.g. by a reloaded cog) is
+    created straight away. Creating an index that already exists is a no-op.
+    """
+
+    def __init__(self):
+        # collection full name: (collection, {index name: IndexModel})
+        self._declared = {}
+        self._ensured = False
+
+    def declare(self, collection, keys, **kwargs):
+        """Declares an index, `keys` and `kwargs` are passed to `pymongo.IndexModel`."""
+        model = IndexModel(keys, **kwargs)
+        name = model.document['name']
+
+        _, models = self._declared.setdefault(collection.full_name, (collection, {}))
+        if name in models:
+            return
+
+        models[name] = model
+
+        if self._ensured:
+            asyncio.ensure_future(self._ensure(collection, [model]))
+
+    async def _ensure(self, collection, models):
+        try:
+            await collection.create_indexes(models)
+        except OperationFailure as e:
+            log.error(f'{self.__class__.__name__} - Failed to create indexes on {collection.full_name}: {e}')
+        else:
+            log.debug(f'{self.__class__.__name__} - Ensured {len(models)} indexes on {collection.full_name}')
+
+    async def ensure(self):
+        """Creates every declared index."""
+        self._ensured = True
+
+        await asyncio.gather(*(
+            self._ensure(collection, list(models.values())) for collection, models in self._declared.values()
+        ))
+
+    def __iter__(self):
+        """Yields ``(collection, IndexModel)`` for every declared index."""
+        for collection, models in self._declared.values():
+            for model in models.values():
+                yield collection, model
+
+    @property
+    def databases(self):
+        """Every database that has declared indexes."""
+        return list({collection.database.name: collection.database for collection, _ in self._declared.values()}.values())
+
+    @staticmethod
+    async def collection_scans(db, *, since=None):
+        """Summarizes the queries the profiler saw scanning a whole collection.
+
+        The database profiler has to be on (level 1 or 2) for anything to show
+        up. Returns ``[{'_id': {'ns', 'op'}, 'count', 'docs_examined', 'example'}, ...]``,
+        most frequent first.
+        """
+        match = {'planSummary': 'COLLSCAN', 'ns': {'$not': {'$regex': r'\.system\.'}}}
+        if since is not None:
+            match['ts'] = {'$gte': since}
+
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': {'ns': '$ns', 'op': '$op'},
+                'count': {'$sum': 1},
+                'docs_examined': {'$sum': '$docsExamined'},
+                'example': {'$last': '$command'}
+            }},
+            {'$sort': {'count': -1}}
+        ]
+
+        return await db['system.profile'].aggregate(pipeline).to_list(length=None)
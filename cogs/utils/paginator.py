@@ -1,4 +1,5 @@
 import asyncio
+import inspect
 import discord
 
 class CannotPaginate(Exception):
@@ -102,6 +103,9 @@ class Pages:
     async def show_page(self, page, *, first=False):
         self.current_page = page
         entries = self.get_page(page)
+        if inspect.isawaitable(entries):
+            entries = await entries
+
         self.prepare_embed(entries, page, first=first)
 
         if not self.paginating:
@@ -240,6 +244,42 @@ class Pages:
 
             await self.match()
 
+class CursorPages(Pages):
+    """Similar to Pages except the entries are fetched a page at a time,
+    for queries too big to load up front.
+
+    Pages are fetched with the cursor of the last entry on the page before,
+    which is remembered as pages are visited. Jumping ahead to a page that
+    hasn't been visited skips entries instead.
+
+    Parameters
+    ------------
+    fetch: Callable[..., Awaitable[List[Tuple[Any, str]]]]
+        Called as ``fetch(after=cursor, skip=skip, limit=limit)``, returns up
+        to `limit` ``(cursor, entry)`` pairs following `after`, or following
+        the first `skip` entries when `after` is None.
+    count: int
+        How many entries there are in total.
+    """
+    def __init__(self, ctx, *, fetch, count, per_page=12, show_entry_count=True):
+        # a range stands in for the entries, so pages are counted without loading anything
+        super().__init__(ctx, entries=range(count), per_page=per_page, show_entry_count=show_entry_count)
+        self.fetch = fetch
+
+        # page: cursor of the last entry on the page before it
+        self._cursors = {1: None}
+
+    async def get_page(self, page):
+        if page in self._cursors:
+            rows = await self.fetch(after=self._cursors[page], skip=0, limit=self.per_page)
+        else:
+            rows = await self.fetch(after=None, skip=(page - 1) * self.per_page, limit=self.per_page)
+
+        if rows:
+            self._cursors[page + 1] = rows[-1][0]
+
+        return [entry for _, entry in rows]
+
 class FieldPages(Pages):
     """Similar to Pages except entries should be a list of
     tuples having (key, value) to show as embed fields instead.
@@ -0,0 +1,179 @@
+import asyncio
+import datetime
+import time
+
+from collections import Counter
+
+import discord
+
+# discord only bulk deletes up to 100 messages at once, none older than 14 days
+BULK_DELETE_MAX = 100
+BULK_DELETE_AGE = datetime.timedelta(days=14)
+
+# leeway so a message doesn't age out between being queued and deleted
+BULK_DELETE_MARGIN = datetime.timedelta(minutes=10)
+
+# pause between single deletes, they share a much tighter rate limit
+SINGLE_DELETE_DELAY = 1.0
+
+class Purge:
+    """Streams a channel's history and deletes matching messages as it goes.
+
+    Matches are grouped into bulk deletes of up to 100 messages. Anything too
+    old to bulk delete (or everything, when `bulk` is False) goes through a
+    rate-limited lane of single deletes. Fetching history and both delete lanes
+    run concurrently.
+
+    Parameters
+    ------------
+    channel: discord.TextChannel
+        The channel to purge.
+    limit: int
+        How many messages to search.
+    check: Callable[[discord.Message], bool]
+        Which messages to delete. Defaults to all of them.
+    before, after: Optional[discord.abc.Snowflake]
+        Passed through to `channel.history`.
+    bulk: bool
+        Whether bulk deletes can be used. Requires Manage Messages.
+    progress: Optional[Callable[[Purge], Awaitable]]
+        Called every `progress_interval` seconds while the purge runs.
+
+    Attributes
+    -----------
+    searched: int
+        How many messages have been looked at so far.
+    deleted: int
+        How many messages have been deleted so far.
+    spammers: collections.Counter
+        Deleted message counts by author display name.
+    cancelled: bool
+        Whether the purge was cancelled before finishing.
+    """
+
+    def __init__(self, channel, *, limit, check=None, before=None, after=None, bulk=True, progress=None, progress_interval=5.0):
+        self.channel = channel
+        self.limit = limit
+        self.check = check or (lambda m: True)
+        self.before = before
+        self.after = after
+        self.bulk = bulk
+        self.progress = progress
+        self.progress_interval = progress_interval
+
+        self.searched = 0
+        self.deleted = 0
+        self.spammers = Counter()
+        self.cancelled = False
+
+        self._last_progress = time.monotonic()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _bulk_minimum(self):
+        return discord.utils.time_snowflake(datetime.datetime.utcnow() - BULK_DELETE_AGE + BULK_DELETE_MARGIN)
+
+    def _record(self, messages):
+        self.deleted += len(messages)
+        self.spammers.update(m.author.display_name for m in messages)
+
+    async def _report(self):
+        if self.progress is None:
+            return
+
+        now = time.monotonic()
+        if now - self._last_progress < self.progress_interval:
+            return
+
+        self._last_progress = now
+        await self.progress(self)
+
+    async def _produce(self, bulk_queue, single_queue):
+        batch = []
+        minimum = self._bulk_minimum()
+
+        async for message in self.channel.history(limit=self.limit, before=self.before, after=self.after):
+            if self.cancelled:
+                break
+
+            self.searched += 1
+            if self.searched % BULK_DELETE_MAX == 0:
+                minimum = self._bulk_minimum()
+
+            if self.check(message):
+                if self.bulk and message.id > minimum:
+                    batch.append(message)
+                    if len(batch) == BULK_DELETE_MAX:
+                        await bulk_queue.put(batch)
+                        batch = []
+                else:
+                    await single_queue.put(message)
+
+            await self._report()
+
+        if batch and not self.cancelled:
+            await bulk_queue.put(batch)
+
+        await bulk_queue.put(None)
+        await single_queue.put(None)
+
+    async def _bulk_lane(self, queue):
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+
+            # keep draining so the producer never blocks on a full queue
+            if self.cancelled:
+                continue
+
+            await self.channel.delete_messages(batch)
+            self._record(batch)
+
+    async def _single_lane(self, queue):
+        while True:
+            message = await queue.get()
+            if message is None:
+                return
+
+            if self.cancelled:
+                continue
+
+            try:
+                await message.delete()
+            except discord.NotFound:
+                pass
+            else:
+                self._record((message,))
+
+            await asyncio.sleep(SINGLE_DELETE_DELAY)
+
+    async def run(self):
+        """Runs the purge to completion, or until cancelled.
+
+        Any exception raised while fetching or deleting stops the purge and is re-raised.
+        """
+
+        # bounded so fetching history can't run far ahead of the deletes
+        bulk_queue = asyncio.Queue(maxsize=2)
+        single_queue = asyncio.Queue(maxsize=BULK_DELETE_MAX)
+
+        loop = asyncio.get_event_loop()
+        tasks = [
+            loop.create_task(self._produce(bulk_queue, single_queue)),
+            loop.create_task(self._bulk_lane(bulk_queue)),
+            loop.create_task(self._single_lane(single_queue))
+        ]
+
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        for task in done:
+            if task.exception():
+                raise task.exception()
+
+        return self
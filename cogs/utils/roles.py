@@ -0,0 +1,56 @@
+from collections import Counter
+
+class RoleCounts:
+    """Member counts for every role, per guild.
+
+    A guild's counts are built from its member list the first time they're
+    asked for, and are then kept up to date from member join, leave and update
+    events, so reading them never has to scan the members again. Events
+    missed while disconnected aren't replayed, so everything is dropped with
+    `clear` on ready and rebuilt when next asked for.
+    """
+
+    def __init__(self):
+        # guild_id: Counter(role_id: member count)
+        self._guilds = {}
+
+    def get(self, guild):
+        counts = self._guilds.get(guild.id)
+        if counts is None:
+            counts = Counter(role.id for member in guild.members for role in member.roles)
+            self._guilds[guild.id] = counts
+        return counts
+
+    def clear(self, guild_id=None):
+        if guild_id is None:
+            self._guilds.clear()
+        else:
+            self._guilds.pop(guild_id, None)
+
+    def member_join(self, member):
+        counts = self._guilds.get(member.guild.id)
+        if counts is not None:
+            counts.update(role.id for role in member.roles)
+
+    def member_remove(self, member):
+        counts = self._guilds.get(member.guild.id)
+        if counts is not None:
+            counts.subtract(role.id for role in member.roles)
+
+    def member_update(self, before, after):
+        if before.roles == after.roles:
+            return
+
+        counts = self._guilds.get(after.guild.id)
+        if counts is None:
+            return
+
+        before_ids = {role.id for role in before.roles}
+        after_ids = {role.id for role in after.roles}
+        counts.subtract(before_ids - after_ids)
+        counts.update(after_ids - before_ids)
+
+    def role_delete(self, role):
+        counts = self._guilds.get(role.guild.id)
+        if counts is not None:
+            counts.pop(role.id, None)
@@ -0,0 +1,225 @@
+import re
+import time
+
+from collections import OrderedDict, deque, namedtuple
+
+RE_WORD = re.compile(r'\w+')
+
+_MASK = (1 << 64) - 1
+
+def simhash(tokens):
+    """64 bit simhash of a list of tokens, near-identical token lists give hashes
+    that only differ in a few bits.
+
+    Bit `i` is set when more than half of the token hashes have bit `i` set. The
+    per-bit counts are kept "bit sliced": ``counters[j]`` holds bit `j` of all 64
+    counts at once, so adding a token is a few integer ops instead of 64.
+    """
+    n = len(tokens)
+    width = (n + 1).bit_length() + 1
+
+    # start every count at a bias that makes the top bit flip exactly when count > n / 2
+    bias = (1 << (width - 1)) - n // 2 - 1
+    counters = [_MASK if bias >> j & 1 else 0 for j in range(width)]
+
+    for token in tokens:
+        carry = hash(token) & _MASK
+        for j in range(width):
+            counter = counters[j]
+            counters[j] = counter ^ carry
+            carry &= counter
+            if not carry:
+                break
+
+    return counters[-1]
+
+class MentionTracker:
+    """Counts how many distinct users each member mentioned recently, per guild.
+
+    Each member's window is split into `buckets` time slices holding the IDs
+    mentioned during that slice, and whole slices drop off as they age out.
+    Only members who actually mention someone are tracked, and each guild
+    keeps at most `max_members` of them, dropping whoever has been quiet the
+    longest.
+    """
+
+    def __init__(self, *, buckets=6, max_members=5000, clock=time.monotonic):
+        self.buckets = buckets
+        self.max_members = max_members
+        self._clock = clock
+
+        # guild_id: OrderedDict(user_id: deque([bucket, set(user_id)]))
+        # members are kept in order of their last mention, oldest first
+        self._guilds = {}
+
+    def _expire(self, members, oldest):
+        # only the front of the ordered dict can be stale
+        while members:
+            user_id, slices = next(iter(members.items()))
+            if slices[-1][0] >= oldest:
+                break
+            del members[user_id]
+
+    def add(self, guild_id, user_id, mentioned, *, window, limit):
+        """Records mentions and returns how many distinct users were mentioned
+        within the last `window` seconds.
+
+        Each time slice stores at most `limit` IDs, there's no point remembering
+        more than it takes to cross the threshold.
+        """
+        # a window saved as 0 before it was validated would divide by zero
+        width = max(window, 1) / self.buckets
+        bucket = int(self._clock() // width)
+        oldest = bucket - self.buckets + 1
+
+        members = self._guilds.setdefault(guild_id, OrderedDict())
+        self._expire(members, oldest)
+
+        slices = members.pop(user_id, None)
+        if slices is None:
+            slices = deque()
+        members[user_id] = slices
+
+        while slices and slices[0][0] < oldest:
+            slices.popleft()
+
+        seen = set()
+        for _, ids in slices:
+            seen.update(ids)
+
+        if not slices or slices[-1][0] != bucket:
+            slices.append((bucket, set()))
+
+        current = slices[-1][1]
+        for mention in mentioned:
+            if len(current) >= limit:
+                break
+            current.add(mention)
+            seen.add(mention)
+
+        if len(members) > self.max_members:
+            members.popitem(last=False)
+
+        return len(seen)
+
+    def clear(self, guild_id, user_id=None):
+        if user_id is None:
+            self._guilds.pop(guild_id, None)
+            return
+
+        members = self._guilds.get(guild_id)
+        if members is not None:
+            members.pop(user_id, None)
+
+
+Sighting = namedtuple('Sighting', 'timestamp fingerprint author_id channel_id message_id')
+
+class FloodDetector:
+    """Spots the same, or nearly the same, text being posted by many accounts
+    or in many channels, per guild.
+
+    Messages are normalized into lowercase words and fingerprinted with a
+    `simhash` of their character trigrams, small edits only flip a few bits.
+    The fingerprint is split into eight 8 bit bands, and every band keeps the
+    recent messages that shared it, so fingerprints that differ by up to seven
+    bits always land together in at least one band. Messages in a band are only
+    counted as copies when their fingerprints really are close, and it's a
+    flood once the copies within the window come from `threshold` or more
+    different authors or channels.
+
+    Each band keeps at most `max_sightings` messages and each guild at most
+    `max_bands` bands, dropping the least recently used.
+
+    A flood is reported once however many bands it lands in. The fingerprints
+    of reported floods are remembered until they haven't been seen for a window.
+    """
+
+    BANDS = 8
+    BAND_BITS = 8
+    MAX_DISTANCE = 10
+
+    def __init__(self, *, min_words=4, max_sightings=50, max_bands=5000, clock=time.monotonic):
+        self.min_words = min_words
+        self.max_sightings = max_sightings
+        self.max_bands = max_bands
+        self._clock = clock
+
+        # guild_id: OrderedDict((band, value): deque(Sighting)), least recently used first
+        self._guilds = {}
+
+        # guild_id: {fingerprint: when a copy was last seen}, for floods already reported
+        self._reported = {}
+
+    def _expire(self, clusters, oldest):
+        while clusters:
+            key, sightings = next(iter(clusters.items()))
+            if sightings and sightings[-1].timestamp >= oldest:
+                break
+            del clusters[key]
+
+    def add(self, guild_id, message, *, window, threshold):
+        """Records a message.
+
+        Returns None if it isn't part of a flood. Otherwise returns
+        ``(sightings, first)``: the first time a flood is reported, `sightings` is
+        every message seen in it so far and `first` is True, after that it's
+        just this message.
+        """
+        words = RE_WORD.findall(message.content.casefold())
+        if len(words) < self.min_words:
+            return None
+
+        text = ' '.join(words)
+        fingerprint = simhash([text[i:i + 3] for i in range(len(text) - 2)])
+        now = self._clock()
+        oldest = now - window
+        sighting = Sighting(now, fingerprint, message.author.id, message.channel.id, message.id)
+
+        clusters = self._guilds.setdefault(guild_id, OrderedDict())
+        self._expire(clusters, oldest)
+
+        flood = None
+        mask = (1 << self.BAND_BITS) - 1
+        for band in range(self.BANDS):
+            key = (band, fingerprint >> (band * self.BAND_BITS) & mask)
+
+            sightings = clusters.pop(key, None)
+            if sightings is None:
+                sightings = deque(maxlen=self.max_sightings)
+            clusters[key] = sightings
+
+            while sightings and sightings[0].timestamp < oldest:
+                sightings.popleft()
+
+            sightings.append(sighting)
+
+            if flood is None and len(sightings) >= threshold:
+                copies = [s for s in sightings if bin(s.fingerprint ^ fingerprint).count('1') <= self.MAX_DISTANCE]
+                authors = len({s.author_id for s in copies})
+                channels = len({s.channel_id for s in copies})
+                if max(authors, channels) >= threshold:
+                    flood = copies
+
+        while len(clusters) > self.max_bands:
+            clusters.popitem(last=False)
+
+        if flood is None:
+            return None
+
+        reported = self._reported.setdefault(guild_id, {})
+        for seen in [f for f, last in reported.items() if last < oldest]:
+            del reported[seen]
+
+        # a copy of an already reported flood, whichever band it turned up in
+        fingerprints = {s.fingerprint for s in flood}
+        for seen in reported:
+            if any(bin(seen ^ f).count('1') <= self.MAX_DISTANCE for f in fingerprints):
+                reported[fingerprint] = now
+                return [sighting], False
+
+        reported.update(dict.fromkeys(fingerprints, now))
+        return flood, True
+
+    def clear(self, guild_id):
+        self._guilds.pop(guild_id, None)
+        self._reported.pop(guild_id, None)
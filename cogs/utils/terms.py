@@ -0,0 +1,189 @@
+import hashlib
+import re
+import unicodedata
+
+from lru import LRU
+
+from .automaton import Automaton
+
+RE_WORD_CHARS = re.compile(r'\w*')
+
+# characters that re.IGNORECASE matches against ascii letters, but that
+# str.lower doesn't turn into them (U+0130 even lowercases to two characters)
+_CASEFIX = {0x130: 'i', 0x131: 'i', 0x17f: 's'}
+
+# version: TermMatcher, shared by every guild with the same lists
+_compiled = LRU(256)
+
+# common substitutions for letters
+LEETSPEAK = {
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '9': 'g',
+    '@': 'a', '$': 's', '!': 'i'
+}
+
+# letters from other scripts that look like latin ones
+CONFUSABLES = {
+    # cyrillic
+    'а': 'a', 'в': 'b', 'г': 'r', 'е': 'e', 'ё': 'e', 'з': 'e', 'і': 'i', 'ї': 'i', 'ј': 'j', 'к': 'k',
+    'м': 'm', 'н': 'h', 'о': 'o', 'п': 'n', 'р': 'p', 'с': 'c', 'т': 't', 'у': 'y', 'х': 'x', 'ѕ': 's',
+    'ԁ': 'd', 'ԛ': 'q', 'ԝ': 'w', 'ɡ': 'g', 'ı': 'i',
+    'А': 'A', 'В': 'B', 'Е': 'E', 'З': 'E', 'І': 'I', 'Ј': 'J', 'К': 'K', 'М': 'M', 'Н': 'H', 'О': 'O',
+    'Р': 'P', 'С': 'C', 'Т': 'T', 'У': 'Y', 'Х': 'X', 'Ѕ': 'S', 'Ԁ': 'D', 'Ԛ': 'Q', 'Ԝ': 'W',
+    # greek
+    'α': 'a', 'β': 'b', 'γ': 'y', 'ε': 'e', 'η': 'n', 'ι': 'i', 'κ': 'k', 'ν': 'v', 'ο': 'o', 'ρ': 'p',
+    'τ': 't', 'υ': 'u', 'χ': 'x',
+    'Α': 'A', 'Β': 'B', 'Ε': 'E', 'Ζ': 'Z', 'Η': 'H', 'Ι': 'I', 'Κ': 'K', 'Μ': 'M', 'Ν': 'N', 'Ο': 'O',
+    'Ρ': 'P', 'Τ': 'T', 'Υ': 'Y', 'Χ': 'X'
+}
+
+# invisible characters that can be slipped into the middle of a word
+ZERO_WIDTH = '\u00ad\u034f\u180e\u200b\u200c\u200d\u2060\u2061\u2062\u2063\u2064\ufeff'
+
+_LEET_TABLE = str.maketrans(LEETSPEAK)
+
+# after NFKD: confusables and leetspeak mapped, zero width characters and accents dropped
+_TOKEN_TABLE = str.maketrans({
+    **{ord(char): None for char in ZERO_WIDTH},
+    **{code: None for code in range(0x300, 0x370)},
+    **{code: None for code in range(0xfe00, 0xfe10)},
+    **CONFUSABLES,
+    **LEETSPEAK
+})
+
+# token: normalized token
+_tokens = LRU(8192)
+
+def fold(text):
+    """Lowercases text the way re.IGNORECASE compares it, without changing its length."""
+    if not text.isascii():
+        text = text.translate(_CASEFIX)
+    return text.lower()
+
+def _normalize_token(token):
+    normalized = _tokens.get(token)
+    if normalized is None:
+        normalized = _tokens[token] = unicodedata.normalize('NFKD', token).translate(_TOKEN_TABLE)
+    return normalized
+
+def normalize(text):
+    """Undoes the usual tricks for getting words past a filter.
+
+    Leetspeak (``f4g``) is mapped back to letters, and outside of ascii,
+    compatibility forms (fullwidth, bold...) and lookalike letters from other
+    scripts are folded into latin ones while accents and zero width
+    characters are dropped. Words are normalized one at a time and cached,
+    so repeated words are a single lookup. Whitespace is collapsed.
+    """
+    if text.isascii():
+        return text.translate(_LEET_TABLE)
+
+    return ' '.join([_normalize_token(token) for token in text.split()])
+
+def terms_version(terms, exceptions=()):
+    """Hash identifying a pair of term and exception lists."""
+    digest = hashlib.sha1()
+    for word in terms:
+        digest.update(fold(word).encode() + b'\0')
+
+    digest.update(b'\1')
+    for word in exceptions:
+        digest.update(fold(word).encode() + b'\0')
+
+    return digest.hexdigest()
+
+def compile_terms(terms, exceptions=()):
+    """Returns a `TermMatcher` for the lists, only building one when they haven't been seen before."""
+    version = terms_version(terms, exceptions)
+
+    matcher = _compiled.get(version)
+    if matcher is None:
+        matcher = _compiled[version] = TermMatcher(terms, exceptions)
+
+    return matcher
+
+class TermMatcher:
+    """Finds flagged terms in text, and the words they appear in.
+
+    Every term is looked for at once with an `Automaton`, so the cost is one
+    pass over the text however many terms there are. Terms are matched
+    anywhere inside a word, case insensitively.
+
+    Parameters
+    ------------
+    terms: Iterable[str]
+        The terms to flag. When several terms start at the same place, the
+        earliest one in this list wins.
+    exceptions: Iterable[str]
+        Words that contain a term but shouldn't be flagged for it, e.g.
+        ``bastard`` stops ``tard`` from matching inside it.
+    """
+
+    __slots__ = ('terms', 'exceptions', '_automaton', '_exceptions')
+
+    def __init__(self, terms, exceptions=()):
+        self._automaton = Automaton(fold(term) for term in terms)
+        self.terms = self._automaton.patterns
+        self.exceptions = tuple(dict.fromkeys(fold(word) for word in exceptions if word))
+
+        # term index: ((offset of the term in the exception, exception), ...)
+        self._exceptions = [()] * len(self.terms)
+        for word in self.exceptions:
+            for start, _, index in self._automaton.finditer(word):
+                self._exceptions[index] += ((start, word),)
+
+    def __bool__(self):
+        return bool(self.terms)
+
+    def _starts(self, folded):
+        """Maps every position a term starts at to the first term starting there."""
+        exceptions = self._exceptions
+        starts = {}
+
+        for start, _, index in self._automaton.finditer(folded):
+            if any(start >= offset and folded.startswith(word, start - offset) for offset, word in exceptions[index]):
+                continue
+
+            if index < starts.get(start, index + 1):
+                starts[start] = index
+
+        return starts
+
+    def findall(self, text):
+        """Returns ``[(word, term), ...]`` for every flagged word in the text.
+
+        `word` is the whole run of word characters around the term, and `term`
+        is the part of it that matched, both as they appear in the text. A
+        word is only reported once, for the last term in it.
+        """
+        starts = self._starts(fold(text))
+        if not starts:
+            return []
+
+        positions = sorted(starts)
+        matches = []
+        pos = 0
+        i = 0
+        while i < len(positions):
+            first = positions[i]
+            if first < pos:
+                i += 1
+                continue
+
+            # back up to the start of the word
+            begin = first
+            while begin > pos and (text[begin - 1].isalnum() or text[begin - 1] == '_'):
+                begin -= 1
+
+            # the last term starting within the word, or right after it
+            limit = RE_WORD_CHARS.match(text, begin).end()
+            while i + 1 < len(positions) and positions[i + 1] <= limit:
+                i += 1
+
+            start = positions[i]
+            end = start + len(self.terms[starts[start]])
+            pos = RE_WORD_CHARS.match(text, end).end()
+
+            matches.append((text[begin:pos], text[start:end]))
+            i += 1
+
+        return matches
@@ -0,0 +1,100 @@
+"""Benchmarks compiled message filters against the old list-of-lambdas predicates.
+
+Runs over synthetic 2000 message histories, the most `remove custom` and
+`massban --channel` used to search.
+
+    python dev_scripts/bench_message_filters.py
+"""
+
+import os
+import random
+import string
+import sys
+import timeit
+
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cogs.utils.filters import MessageFilter
+
+HISTORY_SIZE = 2000
+ROUNDS = 20
+
+def make_history(seed=0):
+    rand = random.Random(seed)
+    words = [''.join(rand.choices(string.ascii_lowercase, k=rand.randint(2, 9))) for _ in range(3000)]
+    words += ['discord.gg/raid', 'free nitro', '@everyone', 'https://bit.ly/x']
+    authors = [SimpleNamespace(id=i, bot=i % 10 == 0) for i in range(50)]
+
+    history = []
+    for _ in range(HISTORY_SIZE):
+        history.append(SimpleNamespace(
+            content=' '.join(rand.choices(words, k=rand.randint(1, 60))),
+            author=rand.choice(authors),
+            embeds=[None] * (rand.random() < 0.1),
+            attachments=[None] * (rand.random() < 0.05),
+            reactions=[None] * (rand.random() < 0.2)
+        ))
+    return history
+
+def legacy(contains=None, starts=None, ends=None, bot=False, files=False, _or=False):
+    """How `remove custom` built its predicate before."""
+    predicates = []
+    if bot:
+        predicates.append(lambda m: m.author.bot)
+    if files:
+        predicates.append(lambda m: len(m.attachments))
+    if contains:
+        predicates.append(lambda m: any(sub in m.content for sub in contains))
+    if starts:
+        predicates.append(lambda m: any(m.content.startswith(s) for s in starts))
+    if ends:
+        predicates.append(lambda m: any(m.content.endswith(s) for s in ends))
+
+    op = all if not _or else any
+    return lambda m: op(p(m) for p in predicates)
+
+def compiled(contains=None, starts=None, ends=None, bot=False, files=False, _or=False):
+    filters = MessageFilter(require_all=not _or)
+    if bot:
+        filters.add(lambda m: m.author.bot)
+    if files:
+        filters.add(lambda m: len(m.attachments))
+    if starts:
+        filters.starts(starts)
+    if ends:
+        filters.ends(ends)
+    if contains:
+        filters.contains(contains)
+    return filters.compile()
+
+CASES = {
+    'contains x3': dict(contains=['discord.gg/', 'free nitro', 'bit.ly']),
+    'contains x3, starts x2, ends x2': dict(contains=['discord.gg/', 'free nitro', 'bit.ly'], starts=['@everyone', 'free'], ends=['raid', 'nitro']),
+    'bot + contains x3': dict(bot=True, contains=['discord.gg/', 'free nitro', 'bit.ly']),
+    'files or contains x3': dict(files=True, contains=['discord.gg/', 'free nitro', 'bit.ly'], _or=True),
+    'contains x128': dict(contains=[''.join(random.Random(i).choices(string.ascii_lowercase, k=7)) for i in range(128)]),
+}
+
+def main():
+    history = make_history()
+
+    print(f'{HISTORY_SIZE} messages, best of {ROUNDS} rounds\n')
+    print(f'{"case":<36} {"legacy":>10} {"compiled":>10} {"speedup":>8}')
+
+    for name, options in CASES.items():
+        old = legacy(**options)
+        new = compiled(**options)
+
+        expected = [m for m in history if old(m)]
+        actual = [m for m in history if new(m)]
+        assert expected == actual, f'{name}: compiled filter disagrees with legacy predicate'
+
+        old_time = min(timeit.repeat(lambda: [m for m in history if old(m)], number=1, repeat=ROUNDS))
+        new_time = min(timeit.repeat(lambda: [m for m in history if new(m)], number=1, repeat=ROUNDS))
+
+        print(f'{name:<36} {old_time * 1000:>8.2f}ms {new_time * 1000:>8.2f}ms {old_time / new_time:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Checks `TermMatcher` against the regex the mod queue used to flag terms
+with, then benchmarks the two.
+
+Compares `findall` output over crafted edge cases and randomly generated
+messages built from fragments of the terms, then times both over
+synthetic 2000 message batches.
+
+    python dev_scripts/bench_term_matcher.py
+"""
+
+import os
+import random
+import re
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cogs.modqueue import TERMS, TERM_EXCEPTIONS
+from cogs.utils.terms import TermMatcher
+
+LEGACY_TERMS = [
+    "nig(?:ga|ger)",
+    "fag",
+    "(?<!bas)tard",
+    "jew",
+    "(?<!su)spic(?!y)",
+    "chink",
+    "gay",
+    "queer",
+    "fudgel"
+]
+
+RE_TERMS = re.compile(r"(\w*(" + "|".join(LEGACY_TERMS) + r")\w*)", re.MULTILINE | re.IGNORECASE)
+
+BATCH_SIZE = 2000
+ROUNDS = 10
+FUZZ_MESSAGES = 200000
+
+EDGE_CASES = [
+    '',
+    'nothing to see here',
+    'tard bastard retard bastardtard tardbastard',
+    'spic spicy suspic suspicious spicspicy spicyspic Suspicion SPICY',
+    'NIGGER nigga nigg niggaer nigger_nigga',
+    'faggot fag_gay gaygay queerjew jewish 0fag fag0',
+    'fudgel FUDGEL fUdGeL',
+    'ſpic İnsane ınsane Kfag Gaİ',
+    'chink​chink, chink.chink',
+    'gay\ngay\tgay',
+    'über_gay straße tard',
+    'bas tard su spic spic y',
+]
+
+def fuzz_message(rand, alphabet):
+    parts = []
+    for _ in range(rand.randint(0, 12)):
+        parts.append(''.join(rand.choices(alphabet, k=rand.randint(1, 8))))
+    return ''.join(rand.choice(' _\n.,!-') + part if rand.random() < 0.6 else part for part in parts)
+
+def make_alphabet():
+    chars = set('bastuyr_0123456789')
+    for word in TERMS + TERM_EXCEPTIONS:
+        chars.update(word, word.upper())
+    chars.update('İıſKéß')
+    return sorted(chars)
+
+def make_batch(seed=0):
+    rand = random.Random(seed)
+    words = [''.join(rand.choices(string.ascii_lowercase, k=rand.randint(2, 9))) for _ in range(3000)]
+    words += ['fag', 'bastard', 'suspicious', 'spicy', 'gay', 'Queer']
+
+    return [' '.join(rand.choices(words, k=rand.randint(1, 60))) for _ in range(BATCH_SIZE)]
+
+def check(matcher, text):
+    expected = RE_TERMS.findall(text)
+    actual = matcher.findall(text)
+    assert expected == actual, f'{text!r}: expected {expected}, got {actual}'
+
+def main():
+    matcher = TermMatcher(TERMS, TERM_EXCEPTIONS)
+
+    for text in EDGE_CASES:
+        check(matcher, text)
+
+    rand = random.Random(0)
+    alphabet = make_alphabet()
+    for _ in range(FUZZ_MESSAGES):
+        check(matcher, fuzz_message(rand, alphabet))
+
+    batch = make_batch()
+    for text in batch:
+        check(matcher, text)
+
+    print(f'{len(EDGE_CASES)} edge cases, {FUZZ_MESSAGES} fuzzed messages: identical matches\n')
+
+    regex_time = min(timeit.repeat(lambda: [RE_TERMS.findall(t) for t in batch], number=1, repeat=ROUNDS))
+    matcher_time = min(timeit.repeat(lambda: [matcher.findall(t) for t in batch], number=1, repeat=ROUNDS))
+
+    print(f'{BATCH_SIZE} messages, best of {ROUNDS} rounds')
+    print(f'regex    {regex_time * 1000:>8.2f}ms')
+    print(f'matcher  {matcher_time * 1000:>8.2f}ms  {regex_time / matcher_time:.1f}x')
+
+if __name__ == '__main__':
+    main()